@@ -0,0 +1 @@
+"""Flask API server for CasAI."""
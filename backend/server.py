@@ -1,55 +1,141 @@
-"""Flask backend server for CasAI application."""
+"""Flask backend server for CasAI application.
+
+Run from the project root with ``python -m backend.server`` (or install the
+project with ``pip install -e .`` so ``core`` is importable from anywhere).
+"""
 
-import sys
 from typing import Union
-from flask import Flask, request, jsonify, send_from_directory, Response
+from flask import Flask, Request, request, jsonify, send_from_directory, Response
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from werkzeug.utils import secure_filename
 import os
-import base64
+import uuid
+import mimetypes
+import hashlib
+import shutil
+import threading
 import traceback
-import pandas as pd
+import numpy as np
 import time
 import json
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
 from pathlib import Path
+from tempfile import NamedTemporaryFile
 from dotenv import load_dotenv
 
-# Add parent directory to path for imports
-PROJECT_ROOT = Path(__file__).resolve().parent.parent
-if str(PROJECT_ROOT) not in sys.path:
-    sys.path.append(str(PROJECT_ROOT))
-
-from google import genai
-from google.genai import types
+try:
+    import orjson
+except ImportError:  # orjson is optional; Flask's stdlib json provider is used instead
+    orjson = None
 
 # טעינת משתני סביבה
 load_dotenv()
 
-# הגדרת ה-Client של ג'מיני החדש
-api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("AIChat_API_KEY")
-client = None
-if api_key:
-    client = genai.Client(api_key=api_key)
-
-# מודל גלובלי לשימוש בפונקציות עזר
-GEMINI_MODEL = 'gemini-2.5-flash'
-
 from core.models import ModelLoader
 from core.config import (
     DETECT_DIR,
     UPLOADS_DIR,
     IMAGES_DIR,
+    IKEA_IMAGES_URL,
     GENERATED_DIR,
+    DETECT_CACHE_SIZE,
+    DETECT_IN_USE_WINDOW,
+    APPDATA_MAX_AGE,
+    APPDATA_SWEEP_INTERVAL,
+    RECOMMEND_CACHE_SIZE,
+    RECOMMEND_CACHE_TTL,
+    SERVER_PORT,
+    SERVER_X_SENDFILE,
+    GENERATION_WORKERS,
+    GENERATION_JOB_TTL,
     ensure_directories,
     url_to_file_path,
-    PROJECT_ROOT,
+    crop_embedding_path,
 )
 
+DETECTIONS_MANIFEST = "detections.json"  # Cached detection result per upload directory
+CROP_EMBEDDINGS = "embeddings.npz"  # CLIP embeddings of the crops, keyed by content digest
+
+# Worker threads for overlapping local inference with network-bound API calls
+executor = ThreadPoolExecutor(max_workers=4)
+
+# Keep-alive connections for downloading recommendation images (mostly from
+# one CDN host), so repeat downloads skip the TLS handshake
+http_session = requests.Session()
+
+# Serialized /recommend responses by (query image, text, top_k, alpha). Query
+# images are crops under a content-hashed directory, so equal paths mean
+# equal pixels.
+_recommend_cache = TTLCache(maxsize=RECOMMEND_CACHE_SIZE, ttl=RECOMMEND_CACHE_TTL)
+_recommend_lock = threading.Lock()
+
+# Design generation takes seconds to minutes, so it runs as a background job
+# the client polls through /jobs/<job_id>, instead of holding a request thread
+generation_executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="generation")
+# Running jobs stay registered until they end, finished ones for GENERATION_JOB_TTL
+_running_jobs = {}
+_generation_jobs = TTLCache(maxsize=1024, ttl=GENERATION_JOB_TTL)
+_generation_lock = threading.Lock()
+
+
+class UploadRequest(Request):
+    """
+    Request that spools uploaded files straight into UPLOADS_DIR.
+
+    Werkzeug keeps file parts under 500 KB in memory and copies larger ones
+    into a temporary file elsewhere, so saving an upload meant writing it a
+    second time. Spooling each part into a file on the uploads filesystem
+    lets store_upload rename it into place instead. Spool files that are not
+    stored are removed when the request closes.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        spool = NamedTemporaryFile('wb+', dir=UPLOADS_DIR, prefix='.upload-', suffix='.part', delete=False)
+        self.__dict__.setdefault('_spool_paths', []).append(spool.name)
+        return spool
+
+    def close(self) -> None:
+        super().close()
+        for path in self.__dict__.get('_spool_paths', ()):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass  # Already renamed into place by store_upload
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes with orjson.
+
+    Keys are sorted like Flask's default provider, and other types still go
+    through DefaultJSONProvider.default. NumPy scalars and arrays are encoded
+    directly, NaN becomes null and dates are written in ISO 8601.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.request_class = UploadRequest
+app.config['USE_X_SENDFILE'] = SERVER_X_SENDFILE
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 CORS(app, resources={
     r"/*": {
         "origins": "*",
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization"],
+        "expose_headers": ["X-Upload-Filename"]
     }
 })
 
@@ -68,6 +154,198 @@ except Exception as e:
     recommendation_service = None
     generation_service = None
 
+# Run the local models once now, so session creation and kernel selection
+# don't land on the first user request
+try:
+    if detection_service is not None:
+        detection_service.warmup()
+    if recommendation_service is not None:
+        recommendation_service.warmup()
+    print("🔥 Models warmed up.")
+except Exception as e:
+    print(f"⚠️ Model warmup failed: {e}")
+
+
+# ============================================================================
+# Helpers
+# ============================================================================
+
+def sweep_appdata() -> None:
+    """Delete uploads, downloads, generated designs and crop directories older than APPDATA_MAX_AGE."""
+    cutoff = time.time() - APPDATA_MAX_AGE
+    for directory in (UPLOADS_DIR, UPLOADS_DIR / "temp", GENERATED_DIR, DETECT_DIR):
+        if not directory.exists():
+            continue
+        for entry in directory.iterdir():
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+                if entry.is_dir():
+                    if directory == DETECT_DIR:
+                        shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    entry.unlink()
+            except OSError:
+                pass  # Removed concurrently or still in use; retry next sweep
+
+
+_last_sweep = 0.0
+
+
+def schedule_sweep() -> None:
+    """Run sweep_appdata on a worker thread, at most once per APPDATA_SWEEP_INTERVAL."""
+    global _last_sweep
+    now = time.time()
+    if now - _last_sweep >= APPDATA_SWEEP_INTERVAL:
+        _last_sweep = now
+        executor.submit(sweep_appdata)
+
+
+def store_upload(img, save_path: Union[str, Path]) -> None:
+    """Move an uploaded file to save_path, renaming its spool file when possible."""
+    stream = img.stream
+    if isinstance(getattr(stream, 'name', None), str):
+        stream.close()  # Windows can't rename an open file
+        os.replace(stream.name, save_path)
+    else:
+        stream.seek(0)  # upload_id has already read it to the end
+        img.save(save_path, buffer_size=1024 * 1024)
+    schedule_sweep()
+
+
+def upload_id(stream) -> str:
+    """Content hash identifying an upload, read from its stream in chunks."""
+    digest = hashlib.blake2b(digest_size=16)
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_upload(img, prefix: str = "") -> Path:
+    """
+    Store an uploaded image under UPLOADS_DIR and return its saved path.
+
+    The file is named after its content hash, so re-uploading the same image
+    reuses one file (and its detections) whatever the client called it. The
+    spooled upload is hashed in chunks rather than read into memory.
+    """
+    suffix = Path(secure_filename(img.filename or "")).suffix.lower() or ".jpg"
+    save_path = UPLOADS_DIR / f"{prefix}{upload_id(img.stream)}{suffix}"
+    try:
+        stored = save_path.stat().st_size > 0
+    except FileNotFoundError:
+        stored = False
+    if stored:
+        # Same bytes already stored (e.g. /detect then /recommend); keep that
+        # file and let the request drop its spool copy
+        os.utime(save_path)  # restart its APPDATA_MAX_AGE clock
+    else:
+        store_upload(img, save_path)
+    return save_path
+
+
+def detection_dir(upload_id: str) -> Path:
+    """Return the crop directory for an upload, evicting least recently used ones."""
+    upload_dir = DETECT_DIR / upload_id
+    try:
+        upload_dir.mkdir()
+    except FileExistsError:
+        os.utime(upload_dir)  # mark as most recently used
+        return upload_dir
+
+    # Only a new directory can push the cache over its size
+    upload_dirs = sorted(
+        ((p.stat().st_mtime, p) for p in DETECT_DIR.iterdir() if p.is_dir()),
+        reverse=True
+    )
+    in_use_cutoff = time.time() - DETECT_IN_USE_WINDOW
+    for mtime, stale_dir in upload_dirs[DETECT_CACHE_SIZE:]:
+        if mtime < in_use_cutoff:
+            shutil.rmtree(stale_dir, ignore_errors=True)
+    return upload_dir
+
+
+def touch_crop_dir(crop_path: Union[str, Path]) -> None:
+    """Mark the crop directory holding crop_path as recently used, so eviction and sweeps keep it."""
+    crop_dir = Path(crop_path).parent
+    if crop_dir.parent == DETECT_DIR:
+        try:
+            os.utime(crop_dir)
+        except OSError:
+            pass  # Already gone; the caller reports the missing crop
+
+
+def embed_crops(upload_dir: Path, crops: list[bytes]) -> None:
+    """
+    Warm the CLIP cache for an upload's crops (JPEG bytes) in one batch.
+
+    The embeddings are also stored in the upload's directory, so the same
+    upload after a server restart primes the cache without running CLIP.
+    """
+    if recommendation_service is None or not crops:
+        return
+    clip_model = recommendation_service.model
+    try:
+        embeddings = clip_model.encode_images(crops)
+        # Digests as a uint8 matrix; a bytes ('S') array would strip trailing NULs
+        keys = np.array([np.frombuffer(clip_model.image_key(crop), np.uint8) for crop in crops])
+        # Unique temp name: concurrent requests for one upload may both write
+        with NamedTemporaryFile('wb', dir=upload_dir, suffix='.tmp', delete=False) as f:
+            np.savez(f, keys=keys, embeddings=embeddings)
+        os.replace(f.name, upload_dir / CROP_EMBEDDINGS)
+    except Exception as e:
+        print(f"⚠️ Failed to pre-embed crops: {e}")
+
+
+def load_crop_embeddings(upload_dir: Path) -> bool:
+    """Prime the CLIP cache from an upload's stored crop embeddings, if present."""
+    if recommendation_service is None:
+        return False
+    try:
+        stored = np.load(upload_dir / CROP_EMBEDDINGS)
+    except FileNotFoundError:
+        return False
+    with stored:
+        keys = [row.tobytes() for row in stored['keys']]
+        recommendation_service.model.prime_image_cache(keys, stored['embeddings'])
+    return True
+
+
+def detect_upload(save_path: Path, embed: bool = False) -> list[dict]:
+    """
+    Detect furniture in an upload, reusing the stored result for identical bytes.
+
+    With embed=True every crop is also embedded, so /recommend on any of
+    them is a cache hit; fresh crops are embedded from memory.
+    """
+    upload_dir = detection_dir(save_path.stem)  # save_upload names the file by upload_id
+    manifest = upload_dir / DETECTIONS_MANIFEST
+    try:
+        detections = json.loads(manifest.read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        detections = None
+    if detections is not None:
+        if embed and not load_crop_embeddings(upload_dir):
+            embed_crops(upload_dir, [crop_embedding_path(d['path']).read_bytes() for d in detections])
+        return detections
+
+    # The upload is only read into memory when it has to be detected
+    detections = detection_service.detect_furniture(
+        image=save_path.read_bytes(),
+        save_dir=str(upload_dir),
+        image_name=save_path.stem,
+        return_crop_bytes=embed
+    )
+    if embed:
+        embed_crops(upload_dir, [d.pop('crop_bytes') for d in detections])
+    # Write then rename so a concurrent request never reads a partial file;
+    # the temp name is unique because concurrent requests may both get here
+    with NamedTemporaryFile('w', dir=upload_dir, suffix='.tmp', delete=False, encoding='utf-8') as f:
+        json.dump(detections, f)
+    os.replace(f.name, manifest)
+    return detections
+
 
 # ============================================================================
 # Routes
@@ -77,7 +355,7 @@ except Exception as e:
 def serve_detected_files(filename: str) -> Response:
     return send_from_directory(str(DETECT_DIR), filename)
 
-@app.route('/data/ikea_il_images/<path:filename>')
+@app.route(f'{IKEA_IMAGES_URL}/<path:filename>')
 def serve_ikea_images(filename: str) -> Response:
     return send_from_directory(str(IMAGES_DIR), filename)
 
@@ -105,16 +383,12 @@ def detect() -> Union[Response, tuple[Response, int]]:
         return jsonify({"error": "image file is required"}), 400
 
     try:
-        img = request.files["image"]
-        save_path = UPLOADS_DIR / img.filename
-        img.save(str(save_path))
-
-        detections = detection_service.detect_furniture(
-            image_path=str(save_path),
-            save_dir=str(DETECT_DIR)
-        )
-
-        return jsonify(detections)
+        save_path = save_upload(request.files["image"])
+        detections = detect_upload(save_path, embed=True)
+        response = jsonify(detections)
+        # The stored name (needed later by /generate_new_design) is content-derived
+        response.headers["X-Upload-Filename"] = save_path.name
+        return response
 
     except FileNotFoundError as e:
         return jsonify({"error": f"Directory not found: {e}"}), 500
@@ -129,10 +403,9 @@ def chat_endpoint():
     save_path = None
 
     if "image" in request.files:
-        img = request.files["image"]
-        image_filename = f"chat_{img.filename}"
-        save_path = str(UPLOADS_DIR / image_filename)
-        img.save(save_path)
+        upload_path = save_upload(request.files["image"], prefix="chat_")
+        image_filename = upload_path.name
+        save_path = str(upload_path)
     elif image_filename:
         save_path = str(UPLOADS_DIR / image_filename)
     
@@ -146,6 +419,25 @@ def chat_endpoint():
     if recommendation_service is None:
         return jsonify({"error": "Service unavailable"}), 500
 
+    if "text/event-stream" in request.headers.get("Accept", ""):
+        # Server-sent events: the reply text as Gemini writes it, then one
+        # event with the same fields as the JSON response below
+        def events():
+            for event in recommendation_service.chat_with_designer_stream(
+                image_path=save_path,
+                messages=messages
+            ):
+                if event.get("done"):
+                    event = {
+                        "done": True,
+                        "response": event["text"],
+                        "recommendations": event["recommendations"],
+                        "image_filename": image_filename
+                    }
+                yield f"data: {app.json.dumps(event)}\n\n"
+
+        return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
     # קריאה לצ'אט - נסמכת על כך שיש מספיק מכסה פנויה
     chat_data = recommendation_service.chat_with_designer(
         image_path=save_path,
@@ -158,10 +450,69 @@ def chat_endpoint():
         "image_filename": image_filename
     })
 
+def run_generation(original_image_path: Path, crop_path: Path, recommendation_image_url: str, prompt: str) -> str:
+    """Generate a design (on a generation worker) and return its URL."""
+    touch_crop_dir(crop_path)  # The job may have waited in the queue
+    # טיפול בתמונה של ההמלצה: יכולה להיות נתיב מקומי או URL חיצוני
+    if recommendation_image_url.startswith("http"):
+        # הורדת תמונה חיצונית לתיקייה זמנית
+        temp_dir = UPLOADS_DIR / "temp"
+        temp_dir.mkdir(exist_ok=True)
+
+        with http_session.get(recommendation_image_url, stream=True, timeout=(5, 30)) as response:
+            if response.status_code != 200:
+                raise RuntimeError("Failed to download recommendation image")
+            # Shopping images are often WebP or PNG; name the file after
+            # what the server sent rather than assuming JPEG
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+            suffix = mimetypes.guess_extension(content_type) or ".jpg"
+            rec_path = temp_dir / f"temp_rec_{uuid.uuid4().hex}{suffix}"
+            response.raw.decode_content = True  # undo any Content-Encoding
+            with open(rec_path, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, 1024 * 1024)
+    else:
+        rec_path = url_to_file_path(recommendation_image_url)
+
+    # A unique name per design, so concurrent generations don't overwrite
+    # each other and browsers never show a cached earlier result
+    save_path = GENERATED_DIR / f"design_{uuid.uuid4().hex}.png"
+
+    print(f"🎨 Generating design using base image: {original_image_path}")
+
+    generation_service.generate_design(
+        str(original_image_path),
+        str(crop_path),
+        str(rec_path),
+        prompt,
+        item_name="furniture",
+        save_path=str(save_path)
+    )
+    if not save_path.exists():
+        raise RuntimeError("Image generation failed")
+
+    # The client fetches the image as a file instead of receiving it
+    # base64-encoded (33% larger) inside the JSON response
+    return f"/generated/{save_path.name}"
+
+
+def finish_generation_job(job_id: str, future) -> None:
+    """
+    Keep a finished generation job pollable for GENERATION_JOB_TTL from now.
+
+    Also prints the traceback of a failed job, once.
+    """
+    with _generation_lock:
+        _running_jobs.pop(job_id, None)
+        _generation_jobs[job_id] = future
+    error = future.exception()
+    if error is not None:
+        print(f"🚨 GENERATION ERROR: {error}")
+        traceback.print_exception(error)
+
+
 @app.post("/generate_new_design")
 def generate_new_design() -> Union[Response, tuple[Response, int]]:
-    """Generate new furniture design and save it as a file on the server."""
-    global generation_service
+    """Start generating a new furniture design; poll /jobs/<job_id> for the result."""
     if generation_service is None:
         return jsonify({"error": "Generation service not available"}), 500
 
@@ -174,90 +525,40 @@ def generate_new_design() -> Union[Response, tuple[Response, int]]:
         print(f"⚠️ Missing fields. Orig: {raw_original_path}, Crop: {selected_crop_url}")
         return jsonify({"error": "Missing required fields"}), 400
 
-    try:
-        # לקיחת שם הקובץ בלבד
-        filename = os.path.basename(raw_original_path)
-        original_image_path = UPLOADS_DIR / filename
-
-        if not original_image_path.exists():
-            print(f"❌ Error: File not found at {original_image_path}")
-            return jsonify({"error": f"Original file not found: {filename}"}), 404
-
-        crop_path = url_to_file_path(selected_crop_url)
-        
-        # טיפול בתמונה של ההמלצה: יכולה להיות נתיב מקומי או URL חיצוני
-        rec_path = None
-        if recommendation_image_url.startswith("http"):
-            # הורדת תמונה חיצונית לתיקייה זמנית
-            import requests
-            from pathlib import Path
-            temp_dir = UPLOADS_DIR / "temp"
-            temp_dir.mkdir(exist_ok=True)
-            temp_path = temp_dir / f"temp_rec_{int(time.time())}.jpg"
-            
-            response = requests.get(recommendation_image_url, stream=True, timeout=10)
-            if response.status_code == 200:
-                with open(temp_path, 'wb') as f:
-                    for chunk in response.iter_content(1024):
-                        f.write(chunk)
-                rec_path = temp_path
-            else:
-                return jsonify({"error": "Failed to download recommendation image"}), 400
-        else:
-            rec_path = url_to_file_path(recommendation_image_url)
-
-        save_path = os.path.join(GENERATED_DIR, "generated.png")
-
-        print(f"🎨 Generating design using base image: {original_image_path}")
-
-        generation_service.generate_design(
-            str(original_image_path),
-            str(crop_path),
-            str(rec_path),
-            prompt,
-            item_name="furniture",
-            save_path=save_path
-        )
-
-        with open(save_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-
-        return jsonify({"generated_image": encoded_string})
-
-    except Exception as e:
-        print(f"🚨 GENERATION ERROR: {e}")
-        traceback.print_exc()
-        return jsonify({"error": "Image generation failed"}), 500
-
-def get_exact_category(user_query):
-    # רשימת הקטגוריות
-    categories = [
-        'Sofa 3-seat', 'Sofa bed', 'Armchair', 'Chair dining', 'Chair office',
-        'Bar chair', 'Bed double', 'Bed single', 'Bed frame', 'Table dining',
-        'Table coffee', 'Desk', 'Bedside table', 'Lamp floor', 'Lamp table',
-        'Chest of drawers', 'TV bench', 'Wardrobe', 'Bookcase', 'Sideboard', 'Outdoor table'
-    ]
-
-    prompt = f"""
-    You are a furniture expert for the CasAI app. 
-    Analyze the user's request: "{user_query}"
-    Choose the MOST relevant category from this exact list: {categories}
-    Return ONLY the category name. If no category fits, return 'None'.
-    """
-
-    if not client:
-        return "None"
+    # לקיחת שם הקובץ בלבד
+    filename = os.path.basename(raw_original_path)
+    original_image_path = UPLOADS_DIR / filename
 
-    try:
-        response = client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=prompt
-        )
-        return response.text.strip()
-    except Exception as e:
-        print(f"Gemini category error: {e}")
-        return "None"
+    if not original_image_path.exists():
+        print(f"❌ Error: File not found at {original_image_path}")
+        return jsonify({"error": f"Original file not found: {filename}"}), 404
 
+    crop_path = url_to_file_path(selected_crop_url)
+    touch_crop_dir(crop_path)
+    job_id = uuid.uuid4().hex
+    future = generation_executor.submit(
+        run_generation, original_image_path, crop_path, recommendation_image_url, prompt
+    )
+    with _generation_lock:
+        _running_jobs[job_id] = future
+    # Registered after the job, since a job that already ended runs it right away
+    future.add_done_callback(lambda done: finish_generation_job(job_id, done))
+    return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
+
+
+@app.get("/jobs/<job_id>")
+def generation_job_status(job_id: str) -> Union[Response, tuple[Response, int]]:
+    """Report a generation job as running, finished (with the image URL) or failed."""
+    with _generation_lock:
+        future = _running_jobs.get(job_id) or _generation_jobs.get(job_id)
+    if future is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if not future.done():
+        return jsonify({"status": "running"})
+
+    if future.exception() is not None:
+        return jsonify({"status": "failed", "error": "Image generation failed"})
+    return jsonify({"status": "finished", "generated_image_url": future.result()})
 
 @app.route("/recommend", methods=["POST"])
 def recommend():
@@ -272,49 +573,74 @@ def recommend():
 
         print(f"🚀 שרת CasAI: מתחיל תהליך עבור: '{text}'")
 
+        text_future = None
         if selected_crop_url:
             query_image_path = str(url_to_file_path(selected_crop_url))
+            touch_crop_dir(query_image_path)
         elif "image" in request.files:
-            img = request.files["image"]
-            save_path = UPLOADS_DIR / img.filename
-            img.save(str(save_path))
-            detections = detection_service.detect_furniture(str(save_path), str(DETECT_DIR))
+            # The text embedding doesn't depend on the detected crop, so
+            # encode it on a worker thread while detection runs
+            if text.strip():
+                text_future = executor.submit(recommendation_service.encode_query_text, text.strip())
+            save_path = save_upload(request.files["image"])
+            detections = detect_upload(save_path)
             if detections:
                 query_image_path = detections[0]["path"]
 
+        top_k, alpha = 10, 0.9
+        cache_key = (query_image_path, text.strip(), top_k, alpha)
+        with _recommend_lock:
+            cached = _recommend_cache.get(cache_key)
+        if cached is not None:
+            return app.response_class(cached, mimetype="application/json")
+
+        # The CLIP query embedding doesn't depend on the Gemini analysis below,
+        # so compute it on a worker thread while waiting for the API response.
+        # CLIP embeds the crop's downscaled copy; Gemini still gets the
+        # full-size crop to judge category and size
+        embed_image_path = str(crop_embedding_path(query_image_path)) if query_image_path else None
+        query_future = executor.submit(
+            recommendation_service.encode_query, text.strip(), embed_image_path, alpha,
+            text_future.result() if text_future is not None else None
+        )
+
         # ניתוח משולב של קטגוריה ומידות בקריאה אחת ל-AI (חוסך זמן יקר!)
         target_cat, est_w, est_l = "None", None, None
+        analysis_failed = False
         if text.strip() or query_image_path:
-            target_cat, est_w, est_l = recommendation_service.analyze_query(text.strip(), query_image_path)
+            analysis = recommendation_service.analyze_query(text.strip(), query_image_path)
+            analysis_failed = analysis is None
+            if not analysis_failed:
+                target_cat, est_w, est_l = analysis
             print(f"🔍 AI Analysis: Category={target_cat}, Dims={est_w}x{est_l}")
 
         # קבלת המלצות (משתמש בנתונים שכבר חושבו)
         results = recommendation_service.recommend(
             query_text=text.strip(),
             query_image_path=query_image_path,
-            top_k=10,
-            alpha=0.9,
+            top_k=top_k,
+            alpha=alpha,
             category_filter=target_cat,
-            precomputed_dims=(est_w, est_l)
+            precomputed_dims=(est_w, est_l),
+            query_vector=query_future.result()
         )
 
-        if 'vector' in results.columns:
-            results = results.drop(columns=['vector'])
-
         # --- כאן היו קודם 3 קריאות מיותרות לחישוב מידות - נמחקו! ---
 
-        response_data = []
-        for _, row in results.iterrows():
-            item_data = {
-                'item_name': row.get('item_name', ''),
-                'item_price': row.get('item_price', ''),
-                'item_url': row.get('product_link', ''),
-                'similarity': row.get('similarity', 0.0),
-                'item_img': f"/data/ikea_il_images/{row['image_file']}" if pd.notna(row.get('image_file')) else row.get('image_url', '')
-            }
-            response_data.append(item_data)
+        # item_img is precomputed on the catalog; to_dict converts cells to Python scalars
+        response_data = (
+            results[['item_name', 'item_price', 'product_link', 'similarity', 'item_img']]
+            .rename(columns={'product_link': 'item_url'})
+            .to_dict(orient='records')
+        )
 
-        return jsonify(response_data)
+        response = jsonify(response_data)
+        # Unfiltered results from a failed analysis aren't cached, so the
+        # next identical request asks Gemini again
+        if not analysis_failed:
+            with _recommend_lock:
+                _recommend_cache[cache_key] = response.get_data()
+        return response
 
     except Exception as e:
         print(f"🚨 RECOMMENDATION ERROR: {e}")
@@ -323,7 +649,6 @@ def recommend():
 
 @app.post("/google_search")
 def google_search_endpoint() -> Union[Response, tuple[Response, int]]:
-    global recommendation_service
     try:
         data = request.json or {}
         query = data.get("query", "").strip()
@@ -331,14 +656,13 @@ def google_search_endpoint() -> Union[Response, tuple[Response, int]]:
             return jsonify({"error": "query field is required"}), 400
 
         results = recommendation_service.search_google_shopping(query)
-        for idx, item in enumerate(results):
-            if "id" not in item:
-                item["id"] = idx
-        return jsonify(results)
+        return jsonify([{"id": idx, **item} for idx, item in enumerate(results)])
     except Exception as e:
         print(f"🚨 GOOGLE SEARCH ERROR: {e}")
         traceback.print_exc()
         return jsonify({"error": "Google search failed"}), 500
 
 if __name__ == "__main__":
-    app.run(port=5000, debug=True)
\ No newline at end of file
+    # The debugger and reloader slow every request; opt in with FLASK_DEBUG=1
+    # Development server; use backend/wsgi.py in production
+    app.run(port=SERVER_PORT, debug=os.getenv("FLASK_DEBUG") == "1")
\ No newline at end of file
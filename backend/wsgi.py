@@ -0,0 +1,26 @@
+"""Production WSGI entry point for the CasAI backend.
+
+Serve it with a single process, so the models are loaded once and shared, and
+several threads, so network-bound Gemini calls and local inference overlap:
+
+    python -m backend.wsgi                                    # any OS (waitress)
+    gunicorn -k gthread -w 1 --threads 8 backend.wsgi:app     # Linux / macOS
+
+Concurrent /detect requests are coalesced by the YOLO batch scheduler, which
+also keeps the model on a single thread.
+
+Crops, catalog images and generated designs go out through the server's
+wsgi.file_wrapper (gunicorn copies them with sendfile(2)). Behind Apache
+mod_xsendfile or lighttpd, set SERVER_X_SENDFILE in core/config.py to hand
+them to the front-end server instead.
+"""
+
+from core.config import SERVER_PORT, SERVER_THREADS
+
+from .server import app
+
+if __name__ == "__main__":
+    from waitress import serve
+
+    print(f"🚀 Serving CasAI on http://127.0.0.1:{SERVER_PORT} with {SERVER_THREADS} threads")
+    serve(app, host="127.0.0.1", port=SERVER_PORT, threads=SERVER_THREADS)
@@ -0,0 +1,74 @@
+"""Micro-batching of model calls made concurrently from request threads."""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+
+class BatchScheduler:
+    """Coalesces concurrent submissions into batched calls on one worker thread.
+
+    Each submit() call queues an item and blocks until its result is ready.
+    The worker drains up to max_batch queued items, waiting at most timeout
+    seconds for more to arrive, and passes them to process_batch in a single
+    call. Because only the worker calls the model, it is never used from two
+    threads at once.
+    """
+
+    def __init__(
+            self,
+            process_batch: Callable[[List[Any]], List[Any]],
+            max_batch: int,
+            timeout: float,
+            name: str = "batch-scheduler"
+    ):
+        """
+        Start the worker thread.
+
+        Args:
+            process_batch: Maps a list of items to a list of results, in order
+            max_batch: Maximum number of items per call
+            timeout: Seconds to wait for a batch to fill once an item arrives
+            name: Worker thread name
+        """
+        self.process_batch = process_batch
+        self.max_batch = max(1, max_batch)
+        self.timeout = timeout
+        self._queue: queue.Queue = queue.Queue()
+        threading.Thread(target=self._run, name=name, daemon=True).start()
+
+    def submit(self, item: Any) -> Any:
+        """Queue an item and wait for its result (re-raises the batch's error)."""
+        future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _collect(self) -> list:
+        """Block for one item, then take more until the batch is full or the timeout passes."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.timeout
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = list(self.process_batch(items))
+                if len(results) != len(batch):
+                    # Results can't be matched to items, so none can be trusted
+                    raise ValueError(f"process_batch returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
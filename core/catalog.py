@@ -0,0 +1,96 @@
+"""On-disk layout of the IKEA catalog and its embedding matrix.
+
+The catalog is produced as a single pickled DataFrame whose 'vector' column
+holds one Python list per product. Unpickling that builds a Python float
+object for every embedding value, so it is split into two sidecar files next
+to the pickle: the product metadata (still a pickle, without vectors) and a
+float32 ``.npy`` matrix that is memory-mapped on load. Rows of the matrix are
+L2-normalized, since the catalog is only ever compared by cosine similarity.
+"""
+
+import os
+import pickle
+from pathlib import Path
+from typing import Union
+import numpy as np
+import pandas as pd
+
+from .similarity import row_norms
+
+
+def sidecar_paths(df_path: Union[str, Path]) -> tuple[Path, Path]:
+    """Return the (metadata, embedding matrix) paths for a catalog pickle."""
+    df_path = Path(df_path)
+    return (
+        df_path.with_name(f"{df_path.stem}.meta.pkl"),
+        df_path.with_suffix('.npy'),
+    )
+
+
+def write_sidecars(df: pd.DataFrame, df_path: Union[str, Path]) -> tuple[pd.DataFrame, np.ndarray]:
+    """
+    Split a catalog DataFrame into metadata and a normalized float32 matrix.
+
+    Rows without a vector are dropped. Both files are written to a temporary
+    name first and renamed into place, so a concurrent reader never sees a
+    partially written file. Any search index persisted for the catalog is
+    removed, as it was built from the previous vectors.
+
+    Args:
+        df: Catalog DataFrame with a 'vector' column
+        df_path: Path of the catalog pickle the sidecars belong to
+
+    Returns:
+        Tuple of (metadata DataFrame, embedding matrix)
+    """
+    meta_path, matrix_path = sidecar_paths(df_path)
+    valid_df = df[df['vector'].notna()].reset_index(drop=True)
+    vectors = np.ascontiguousarray(valid_df['vector'].tolist(), dtype=np.float32)
+    vectors /= row_norms(vectors)[:, None] + 1e-8
+    metadata = valid_df.drop(columns=['vector'])
+
+    tmp_matrix = matrix_path.with_name(matrix_path.name + '.tmp')
+    with open(tmp_matrix, 'wb') as f:
+        np.save(f, vectors)
+    tmp_meta = meta_path.with_name(meta_path.name + '.tmp')
+    with open(tmp_meta, 'wb') as f:
+        pickle.dump(metadata, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_matrix, matrix_path)
+    os.replace(tmp_meta, meta_path)
+
+    # Search indexes persisted for the previous vectors no longer apply
+    df_path = Path(df_path)
+    for index_file in df_path.parent.glob(f"{df_path.stem}.*.faiss"):
+        index_file.unlink(missing_ok=True)
+    return metadata, vectors
+
+
+def load_catalog(df_path: Union[str, Path]) -> tuple[pd.DataFrame, np.ndarray]:
+    """
+    Load catalog metadata and a read-only, memory-mapped embedding matrix.
+
+    The sidecar files are (re)generated from the pickle when they are missing
+    or older than it, so an existing catalog pickle keeps working unchanged.
+
+    Args:
+        df_path: Path to the catalog pickle
+
+    Returns:
+        Tuple of (metadata DataFrame, (N, D) L2-normalized float32 matrix)
+    """
+    df_path = Path(df_path)
+    meta_path, matrix_path = sidecar_paths(df_path)
+    source_mtime = df_path.stat().st_mtime
+    stale = not all(p.exists() and p.stat().st_mtime >= source_mtime for p in (meta_path, matrix_path))
+
+    if stale:
+        print(f"🔄 Writing embedding sidecars for {df_path.name}...")
+        with open(df_path, 'rb') as f:
+            write_sidecars(pickle.load(f), df_path)
+
+    with open(meta_path, 'rb') as f:
+        metadata = pickle.load(f)
+    vectors = np.load(matrix_path, mmap_mode='r')
+    if len(metadata) != len(vectors):
+        raise ValueError(f"Catalog sidecars for {df_path} are out of sync")
+    return metadata, vectors
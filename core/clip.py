@@ -1,13 +1,46 @@
 """CLIP model handling for image and text embeddings."""
 
+import torch
 from sentence_transformers import SentenceTransformer
-from .config import CLIP_MODEL_NAME
+from .config import (
+    CLIP_MODEL_NAME,
+    CLIP_IMAGE_SIZE,
+    CLIP_EMBED_BATCH,
+    CLIP_CPU_INT8,
+    CLIP_COMPILE,
+    EMBEDDING_CACHE_SIZE,
+    GPU_HALF_PRECISION,
+)
+from .catalog import write_sidecars
+import io
 import os
-from typing import Optional, List
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Union
+import numpy as np
 import pandas as pd
 import pickle
+import requests
 from PIL import Image
 
+
+def load_image(source) -> Image.Image:
+    """
+    Open an image for CLIP as RGB, decoding JPEGs at reduced size.
+
+    CLIP resizes every input down to CLIP_IMAGE_SIZE, so JPEG draft mode lets
+    libjpeg decode at 1/2, 1/4 or 1/8 scale (never below that size) instead of
+    decoding every pixel of a full-resolution photo only to throw most away.
+
+    Args:
+        source: File path or binary file object
+    """
+    image = Image.open(source)
+    image.draft('RGB', (CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE))
+    return image.convert('RGB')
+
+
 class CLIPModel:
     """Wrapper for CLIP model operations."""
     
@@ -20,6 +53,28 @@ class CLIPModel:
             model_name: Optional model name to load. If model is None, will load using model_name or default.
         """
         self.model = self.load_model()
+        # On CUDA the forward pass runs under fp16 autocast; weights stay fp32
+        # so the image processor's float32 inputs still match them.
+        self._half = GPU_HALF_PRECISION and torch.cuda.is_available()
+        if CLIP_CPU_INT8 and not torch.cuda.is_available():
+            # Nearly all of ViT-B/32's compute is in Linear layers; int8 weights
+            # with per-batch activation scales use the fused int8 GEMM kernels
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        if CLIP_COMPILE:
+            # The sentence-transformers module calls the towers directly, so
+            # swapping in compiled versions leaves encode() unchanged. Batch
+            # size and text length vary per call, hence dynamic shapes.
+            clip = self.model[0].model
+            clip.vision_model = torch.compile(clip.vision_model, dynamic=True)
+            clip.text_model = torch.compile(clip.text_model, dynamic=True)
+        # Query embeddings are memoized in LRU caches: text by its string,
+        # images by a BLAKE2b digest of their bytes, so repeated queries skip
+        # the forward pass. The caches are shared by request threads.
+        self._text_cache = OrderedDict()
+        self._image_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
     
     @staticmethod
     def load_model() -> SentenceTransformer:
@@ -43,7 +98,14 @@ class CLIPModel:
                 "Please run: pip install sentence-transformers"
             )
     
-    def encode_text(self, text: str) -> list:
+    def warmup(self, runs: int = 2) -> None:
+        """Run both encoders on dummy inputs, bypassing the embedding caches."""
+        blank = Image.new('RGB', (CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE))
+        for _ in range(runs):
+            self._encode(['a photo of a sofa'])
+            self._encode([blank])
+
+    def encode_text(self, text: str) -> np.ndarray:
         """
         Encode text into embedding vector.
         
@@ -51,11 +113,87 @@ class CLIPModel:
             text: Text string to encode
             
         Returns:
-            Embedding vector as list
+            float32 embedding vector of shape (D,)
+        """
+        return self.encode_texts([text])[0]
+
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode several texts in one batched forward pass.
+
+        Texts already in the embedding cache are not re-encoded.
+
+        Args:
+            texts: Text strings to encode
+
+        Returns:
+            Array of shape (len(texts), D)
+        """
+        return self._cached_encode(self._text_cache, [(text, text) for text in texts])
+
+    def _encode(self, inputs, **kwargs) -> np.ndarray:
+        """Run the CLIP encoder (fp16 autocast on CUDA), returning float32."""
+        with torch.autocast(device_type='cuda', dtype=torch.float16, enabled=self._half):
+            return np.asarray(self.model.encode(inputs, **kwargs), dtype=np.float32)
+
+    def _cached_encode(self, cache: OrderedDict, keyed_inputs: list, prepare=None) -> np.ndarray:
+        """
+        Look (key, input) pairs up in an LRU cache and batch-encode the misses.
+
+        Args:
+            cache: One of the per-kind embedding caches
+            keyed_inputs: (cache key, model input) pairs, in output order
+            prepare: Optional conversion applied to missed inputs before encoding
+
+        Returns:
+            Array of shape (len(keyed_inputs), D)
         """
-        return self.model.encode(text).tolist()
+        embeddings = {}
+        missing = {}
+        with self._cache_lock:
+            for key, value in keyed_inputs:
+                cached = cache.get(key)
+                if cached is not None:
+                    cache.move_to_end(key)
+                    embeddings[key] = cached
+                else:
+                    missing[key] = value
+
+        if missing:
+            inputs = list(missing.values())
+            if prepare is not None:
+                inputs = [prepare(value) for value in inputs]
+            encoded = self._encode(inputs, batch_size=len(inputs))
+            with self._cache_lock:
+                for key, embedding in zip(missing, encoded):
+                    embeddings[key] = embedding
+                    cache[key] = embedding
+                    if len(cache) > EMBEDDING_CACHE_SIZE:
+                        cache.popitem(last=False)
+
+        return np.stack([embeddings[key] for key, _ in keyed_inputs])
     
-    def encode_image(self, image_path: str) -> list:
+    @staticmethod
+    def image_key(data: bytes) -> bytes:
+        """Image embedding cache key: a BLAKE2b digest of the encoded bytes."""
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def prime_image_cache(self, keys: List[bytes], embeddings: np.ndarray) -> None:
+        """
+        Insert precomputed image embeddings, e.g. ones stored on disk.
+
+        Args:
+            keys: Cache keys from image_key, one per embedding
+            embeddings: Array of shape (len(keys), D)
+        """
+        with self._cache_lock:
+            for key, embedding in zip(keys, embeddings):
+                self._image_cache[key] = embedding
+                self._image_cache.move_to_end(key)
+                if len(self._image_cache) > EMBEDDING_CACHE_SIZE:
+                    self._image_cache.popitem(last=False)
+
+    def encode_image(self, image_path: str) -> np.ndarray:
         """
         Encode image into embedding vector.
         
@@ -63,11 +201,37 @@ class CLIPModel:
             image_path: Path to image file
             
         Returns:
-            Embedding vector as list
+            float32 embedding vector of shape (D,)
+        """
+        return self.encode_images([image_path])[0]
+
+    def encode_images(self, images: List[Union[str, bytes]]) -> np.ndarray:
+        """
+        Encode several images in one batched forward pass.
+        
+        Images already in the embedding cache are not re-encoded.
+        
+        Args:
+            images: Paths to image files, or encoded image bytes already in memory
+            
+        Returns:
+            Array of shape (len(images), D)
         """
-        from PIL import Image
-        img = Image.open(image_path).convert('RGB')
-        return self.model.encode(img).tolist()
+        keyed_inputs = []
+        for image in images:
+            if isinstance(image, bytes):
+                data = image
+            else:
+                with open(image, 'rb') as f:
+                    data = f.read()
+            # Keep the bytes so misses are decoded without reading the file again
+            keyed_inputs.append((self.image_key(data), data))
+
+        return self._cached_encode(
+            self._image_cache,
+            keyed_inputs,
+            prepare=lambda data: load_image(io.BytesIO(data))
+        )
 
     def encode_images_from_csv(
             self,
@@ -99,15 +263,31 @@ class CLIPModel:
             print("   Creating directory. Make sure images are downloaded.")
             os.makedirs(images_dir, exist_ok=True)
 
-        vectors = []
+        vectors = [None] * len(df)
         successful = 0
         failed = 0
+        # (row position, image) pairs waiting to be encoded in one batch
+        pending = []
+
+        def flush():
+            nonlocal successful, failed
+            if pending:
+                try:
+                    embeddings = self._encode([img for _, img in pending], batch_size=CLIP_EMBED_BATCH)
+                except Exception as e:
+                    # A failed forward pass (e.g. out of memory) only loses this batch
+                    print(f"⚠️ Failed to embed a batch of {len(pending)} images: {e}")
+                    failed += len(pending)
+                else:
+                    for (position, _), embedding in zip(pending, embeddings):
+                        vectors[position] = embedding
+                    successful += len(pending)
+                pending.clear()
 
         print("🔄 Processing images and creating embeddings...")
-        for idx, row in df.iterrows():
+        for position, (_, row) in enumerate(df.iterrows()):
             image_file = row.get('image_file', '')
             if pd.isna(image_file) or not image_file:
-                vectors.append(None)
                 failed += 1
                 continue
 
@@ -115,41 +295,31 @@ class CLIPModel:
 
             try:
                 if os.path.exists(image_path):
-                    img = Image.open(image_path).convert('RGB')
-                    embedding = self.model.encode(img)
-                    vectors.append(embedding)
-                    successful += 1
+                    pending.append((position, load_image(image_path)))
                 else:
                     # Try to download from image_url if local file doesn't exist
                     image_url = row.get('image_url', '')
                     if image_url and not pd.isna(image_url):
-                        try:
-                            import requests
-                            response = requests.get(image_url, timeout=10)
-                            if response.status_code == 200:
-                                img = Image.open(requests.get(image_url, stream=True).raw).convert('RGB')
-                                embedding = self.model.encode(img)
-                                vectors.append(embedding)
-                                successful += 1
-                                # Save the image locally
-                                with open(image_path, 'wb') as f:
-                                    f.write(response.content)
-                            else:
-                                vectors.append(None)
-                                failed += 1
-                        except Exception:
-                            vectors.append(None)
+                        response = requests.get(image_url, timeout=10)
+                        if response.status_code == 200:
+                            pending.append((position, load_image(io.BytesIO(response.content))))
+                            # Save the image locally
+                            with open(image_path, 'wb') as f:
+                                f.write(response.content)
+                        else:
                             failed += 1
                     else:
-                        vectors.append(None)
                         failed += 1
             except Exception:
-                vectors.append(None)
                 failed += 1
 
+            if len(pending) >= CLIP_EMBED_BATCH:
+                flush()
+
             # Progress indicator
-            if (idx + 1) % 50 == 0:
-                print(f"   Processed {idx + 1}/{len(df)} images... (Success: {successful}, Failed: {failed})")
+            if (position + 1) % 50 == 0:
+                print(f"   Processed {position + 1}/{len(df)} images... (Success: {successful + len(pending)}, Failed: {failed})")
+        flush()
 
         # Add vectors to DataFrame
         df['vector'] = vectors
@@ -164,6 +334,7 @@ class CLIPModel:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         with open(output_path, 'wb') as f:
             pickle.dump(df_with_vectors, f)
+        write_sidecars(df_with_vectors, output_path)
 
         print(f"✅ Saved embeddings to {output_path}")
 
@@ -2,7 +2,7 @@
 
 import os
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Union
 
 # Project root directory
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -10,6 +10,7 @@ PROJECT_ROOT = Path(__file__).parent.parent
 # Data directories
 DATA_DIR = PROJECT_ROOT / "data"
 IMAGES_DIR = DATA_DIR / "ikea_il_images"
+IKEA_IMAGES_URL = "/" + IMAGES_DIR.relative_to(PROJECT_ROOT).as_posix()  # Served by the backend
 EMBEDDINGS_FILE = DATA_DIR / "ikea_embeddings.pkl"
 CSV_FILE = DATA_DIR / "ikea_il.csv"
 
@@ -18,11 +19,68 @@ APPDATA_DIR = PROJECT_ROOT / "appdata"
 DETECT_DIR = APPDATA_DIR / "detect"
 UPLOADS_DIR = APPDATA_DIR / "uploads"
 GENERATED_DIR = APPDATA_DIR / "generated"
+DETECT_CACHE_SIZE = 32  # Per-upload crop directories kept under DETECT_DIR
+# Crop directories used within this many seconds are never evicted, so a
+# request (or a running generation) doesn't lose a crop it just looked up
+DETECT_IN_USE_WINDOW = 15 * 60
+APPDATA_MAX_AGE = 24 * 3600  # Seconds before uploads and crop directories are swept
+APPDATA_SWEEP_INTERVAL = 15 * 60  # Minimum seconds between sweeps
+
+# Server configuration
+SERVER_PORT = 5000
+SERVER_THREADS = 8  # Request threads for the production WSGI server (backend/wsgi.py)
+GENERATION_WORKERS = 2  # Design generations run concurrently in the background
+GENERATION_JOB_TTL = 3600  # Seconds a finished generation job can still be polled
+# Hand static files (crops, IKEA images, designs) to a front-end server that
+# understands X-Sendfile (Apache mod_xsendfile, lighttpd) instead of sending
+# them from Python. Only enable behind such a server: the response body is empty.
+SERVER_X_SENDFILE = False
 
 # Model configuration
 CLIP_MODEL_NAME = 'clip-ViT-B-32'
+CLIP_IMAGE_SIZE = 224  # CLIP input resolution; JPEGs are decoded no smaller than this
+CLIP_EMBED_BATCH = 64  # Catalog images per CLIP forward pass when embedding the CSV
+# Without CUDA, run CLIP's Linear layers as dynamically quantized int8 (roughly
+# 2x faster on CPU; query embeddings drift slightly from the fp32 catalog).
+CLIP_CPU_INT8 = False
+# Compile CLIP's vision and text towers with torch.compile. Compilation runs
+# during the startup warmup; it needs a working TorchInductor toolchain
+# (a C++ compiler on CPU, Triton on CUDA).
+CLIP_COMPILE = False
 YOLO_CONF_THRESHOLD = 0.25  # Base threshold
 YOLO_MODEL_NAME = 'yolo-train/best.onnx'  # Using the custom-trained model
+YOLO_MAX_DETECTIONS = 10  # Crops returned per image (most confident first)
+# Concurrent /detect requests are coalesced into one predict call of up to
+# this many images. The bundled best.onnx is exported with a static batch of
+# 1; raise this only for a model exported with dynamic=True or batch>1.
+YOLO_MAX_BATCH = 1
+YOLO_BATCH_TIMEOUT = 0.005  # Seconds to wait for a batch to fill
+GPU_HALF_PRECISION = True  # Run YOLO/CLIP inference in fp16 when CUDA is available
+EMBEDDING_CACHE_SIZE = 512  # Memoized CLIP query embeddings (per kind)
+GOOGLE_SHOPPING_CACHE_TTL = 3600  # Seconds to reuse Serper.dev results per query
+QUERY_ANALYSIS_CACHE_SIZE = 4096  # Gemini category/size analyses kept per (text, image)
+RECOMMEND_CACHE_SIZE = 1024  # Serialized /recommend responses kept in memory
+RECOMMEND_CACHE_TTL = 3600  # Seconds to reuse a /recommend response
+
+# Similarity search configuration
+# 'float32' keeps full-precision vectors; 'float16' halves their memory
+# (FAISS SQfp16, near-lossless); 'int8' stores per-row quantized codes
+# (FAISS SQ8: 4x less memory traffic per scan, slightly lower accuracy).
+# Without faiss, the NumPy scan keeps its own fp16 matrix / int8 codes.
+EMBEDDING_PRECISION = 'float32'
+# 'flat' scans every vector exactly; 'hnsw' adds a FAISS HNSW graph and
+# 'ivfpq' a FAISS IVF index of product-quantized codes with an exact rerank,
+# both for sub-linear unfiltered top-k search (require faiss, approximate).
+EMBEDDING_INDEX = 'flat'
+HNSW_M = 32  # Graph neighbours per node
+HNSW_EF_SEARCH = 128  # Candidate list size per query (recall vs speed)
+IVF_NLIST = 64  # Inverted lists (k-means cells); ~sqrt(N) for the catalog
+IVF_NPROBE = 8  # Lists scanned per query (recall vs speed)
+PQ_M = 64  # Sub-quantizers (bytes per code); must divide the embedding dimension
+REFINE_K_FACTOR = 5  # Rerank k * this many PQ candidates on the stored vectors
+# Without faiss, filtered scans over at least this many rows use the Numba
+# kernel (if installed: pip install -e .[no-faiss])
+NUMBA_SCAN_MIN_ROWS = 256
 
 # Target furniture classes
 TARGET_CLASSES = {'bed', 'dresser', 'chair', 'sofa', 'lamp', 'table'}
@@ -77,4 +135,39 @@ def url_to_file_path(url_path: str, base_dir: Path = None) -> Path:
     
     # Remove leading slash and normalize
     clean_path = url_path.lstrip('/').replace('/', os.sep)
-    return base_dir / clean_path
\ No newline at end of file
+    return base_dir / clean_path
+
+
+def crop_thumb_path(crop_path: Union[str, Path]) -> Path:
+    """Return where the downscaled copy of a detection crop is saved ("<name>_thumb.jpg")."""
+    crop_path = Path(crop_path)
+    return crop_path.with_name(f"{crop_path.stem}_thumb{crop_path.suffix}")
+
+
+def crop_embedding_path(crop_path: Union[str, Path]) -> Path:
+    """
+    Return the image to embed for a detection crop.
+
+    Crops larger than the CLIP input get a downscaled copy saved next to them
+    (see crop_thumb_path); smaller crops are embedded as they are.
+    """
+    thumb_path = crop_thumb_path(crop_path)
+    return thumb_path if thumb_path.exists() else Path(crop_path)
+
+
+def file_path_to_url(file_path: str, base_dir: Path = None) -> str:
+    """
+    Convert file system path to URL path (inverse of url_to_file_path).
+    
+    Args:
+        file_path: Path inside base_dir (e.g., ".../appdata/detect/ab12/crop_0.jpg")
+        base_dir: Base directory the URL is relative to (default: PROJECT_ROOT)
+        
+    Returns:
+        URL path (e.g., "/appdata/detect/ab12/crop_0.jpg")
+    """
+    if base_dir is None:
+        base_dir = PROJECT_ROOT
+    
+    relative = Path(file_path).resolve().relative_to(Path(base_dir).resolve())
+    return '/' + relative.as_posix()
\ No newline at end of file
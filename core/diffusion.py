@@ -1,7 +1,6 @@
 """Furniture design generation using Google Gemini 2.5 Flash API."""
 
 import os
-import io
 import traceback
 from typing import Optional
 from google.genai import types
@@ -9,6 +8,20 @@ from google import genai
 from PIL import Image
 from dotenv import load_dotenv
 
+from .gemini import image_part
+
+
+def _write_file(path: str, data: bytes) -> None:
+    """Write bytes straight to a file descriptor, bypassing Python's buffered IO."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
 
 class DesignGenerationService:
     """Service for generating furniture designs using Google Gemini 2.5 Flash API."""
@@ -37,13 +50,13 @@ class DesignGenerationService:
             # 1. פתיחת שלוש התמונות (במקום person1, person2...)
             # אלו התמונות האמיתיות מהמערכת שלך
             print("📂 Loading images...")
-            img_original = Image.open(original_image_path)
-            img_crop = Image.open(crop_image_path)
+            img_original = image_part(original_image_path)
+            img_crop = image_part(crop_image_path)
             
             # וידוא שתמונת ההמלצה קיימת לפני שפותחים
             if not os.path.exists(recommendation_image_path):
                  raise FileNotFoundError(f"Recommendation image not found at: {recommendation_image_path}")
-            img_recommendation = Image.open(recommendation_image_path)
+            img_recommendation = image_part(recommendation_image_path)
 
             # 2. הגדרת הפרומפט (ההוראה למודל)
             # אנחנו אומרים לו במפורש: קח את החדר, תזהה את מה שיש בקרופ, ותחליף אותו במה שיש בהמלצה.
@@ -111,7 +124,7 @@ class DesignGenerationService:
                             # וידוא שהתיקייה קיימת לפני השמירה
                             os.makedirs(os.path.dirname(save_path), exist_ok=True)
                             # שמירת הקובץ (במקום "office.png")
-                            generated_image.save(save_path)
+                            _write_file(save_path, part.inline_data.data)
                             print(f"✅ Image saved successfully to: {save_path}")
                         
                         return generated_image # מחזירים את אובייקט התמונה
@@ -0,0 +1,41 @@
+"""Helpers shared by the services that call the Gemini API."""
+
+import io
+import mimetypes
+
+from PIL import Image
+from google.genai import types
+
+
+def image_part(path: str) -> types.Part:
+    """
+    Wrap an image file's bytes as a Gemini request part.
+
+    The SDK decodes and re-encodes PIL images before sending them; passing
+    the file as it is on disk skips both, and nothing is decoded locally.
+
+    Args:
+        path: Path to a JPEG/PNG/WebP image
+
+    Returns:
+        Part holding the file's bytes and its MIME type
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    return types.Part.from_bytes(data=data, mime_type=image_mime_type(data, path))
+
+
+def image_mime_type(data: bytes, path: str = '') -> str:
+    """
+    Return the MIME type of image bytes from their content.
+
+    File extensions can't be trusted (uploads keep the client's name,
+    downloads may be any format), so PIL reads the format from the header
+    without decoding the pixels. The extension is only a fallback.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            mime_type = Image.MIME.get(img.format)
+    except (OSError, ValueError):
+        mime_type = None
+    return mime_type or mimetypes.guess_type(path)[0] or 'image/jpeg'
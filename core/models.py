@@ -5,14 +5,16 @@ It provides a unified interface to load all services.
 """
 
 import os
-import pickle
+from functools import lru_cache
 from typing import Optional
+import numpy as np
 import pandas as pd
 
 from .clip import CLIPModel
 from .diffusion import DesignGenerationService
 from .yolo import YOLODetectionService
 from .recommender import Recommender
+from .catalog import load_catalog
 from .config import EMBEDDINGS_FILE
 
 
@@ -21,6 +23,9 @@ class ModelLoader:
     
     This class provides high-level service interfaces that backend should use.
     All services are pre-configured and ready to use.
+
+    Heavy resources (model weights, the IKEA DataFrame) are loaded once per
+    process and shared by every service built from this factory.
     """
     
     # ========================================================================
@@ -38,12 +43,16 @@ class ModelLoader:
         Returns:
             YOLODetectionService instance ready to use
         """
-        return YOLODetectionService(model_path=model_path)
+        return YOLODetectionService(yolo_model=ModelLoader._load_yolo_model(model_path))
     
     @staticmethod
+    @lru_cache(maxsize=None)
     def load_recommendation_service(df_path: Optional[str] = None) -> Recommender:
         """
         Load recommendation service with CLIP model and IKEA DataFrame.
+
+        The Recommender is built once per DataFrame path, so its prepared
+        embeddings are reused by every caller instead of being rebuilt.
         
         Args:
             df_path: Optional custom path to DataFrame file
@@ -51,9 +60,16 @@ class ModelLoader:
         Returns:
             Recommender instance ready to use
         """
-        clip_model = CLIPModel()  # Will load default model automatically
-        ikea_df = ModelLoader._load_ikea_dataframe(df_path)
-        return Recommender(model=clip_model, embeddings_df=ikea_df)
+        clip_model = ModelLoader._load_clip_model()
+        ikea_df, embeddings = ModelLoader._load_ikea_catalog(df_path)
+        # Persisted search indexes live next to the catalog they were built from
+        index_cache_stem = os.path.splitext(df_path or str(EMBEDDINGS_FILE))[0]
+        return Recommender(
+            model=clip_model,
+            embeddings_df=ikea_df,
+            embeddings=embeddings,
+            index_cache_stem=index_cache_stem
+        )
     
     @staticmethod
     def load_generation_service() -> DesignGenerationService:
@@ -66,15 +82,33 @@ class ModelLoader:
     # Private Helper Methods
     # ========================================================================
     @staticmethod
-    def _load_ikea_dataframe(df_path: Optional[str] = None) -> pd.DataFrame:
+    @lru_cache(maxsize=None)
+    def _load_yolo_model(model_path: Optional[str] = None):
+        """Load the YOLO weights once per process and share them."""
+        return YOLODetectionService.load_model(model_path)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _load_clip_model() -> CLIPModel:
+        """Load the CLIP model once per process and share it."""
+        return CLIPModel()
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _load_ikea_catalog(df_path: Optional[str] = None) -> tuple[pd.DataFrame, np.ndarray]:
         """
-        Load IKEA DataFrame from pickle file.
+        Load IKEA product metadata and embeddings.
+
+        Embeddings come from a memory-mapped .npy sidecar next to the pickle
+        (created from the pickle on first use), so no Python objects are built
+        per embedding value. The result is cached per path; callers must treat
+        it as read-only.
         
         Args:
             df_path: Optional custom path to DataFrame file. If None, uses config default.
             
         Returns:
-            DataFrame with product data and embeddings
+            Tuple of (product DataFrame without vectors, (N, D) float32 embeddings)
             
         Raises:
             FileNotFoundError: If DataFrame file doesn't exist
@@ -86,7 +120,6 @@ class ModelLoader:
             raise FileNotFoundError(f"IKEA DataFrame not found at {df_path}")
         
         print(f"📖 Loading IKEA DataFrame from {df_path}...")
-        with open(df_path, 'rb') as f:
-            df = pickle.load(f)
+        df, embeddings = load_catalog(df_path)
         print(f"✅ Loaded {len(df)} products from DataFrame")
-        return df
+        return df, embeddings
@@ -1,31 +1,125 @@
 """Recommendation engine for furniture similarity search."""
 
 import os
-from typing import Optional
+from typing import Iterator, Optional
 import numpy as np
 import pandas as pd
-from PIL import Image
 import requests
 import urllib.parse
 import json
 import re
+import threading
+from functools import lru_cache
+from cachetools import LRUCache, TTLCache
 from dotenv import load_dotenv
 from google import genai  # NEW SDK
 from google.genai import types
 
 from .clip import CLIPModel
-from .config import get_style_description
+from .gemini import image_part
+from .config import get_style_description, GOOGLE_SHOPPING_CACHE_TTL, IKEA_IMAGES_URL, QUERY_ANALYSIS_CACHE_SIZE
+from .similarity import SimilarityIndex
+
+
+# "160x200"-style dimensions inside a product name
+DIMENSIONS_PATTERN = re.compile(r'(\d+)\s*[xX*]\s*(\d+)')
+# Outermost {...} block in a Gemini reply
+JSON_OBJECT_PATTERN = re.compile(r'\{.*\}', re.DOTALL)
+# Start of the "response_text" string value in a streamed chat reply
+RESPONSE_TEXT_PATTERN = re.compile(r'"response_text"\s*:\s*"')
+# Backslashes (and a possibly cut-short \uXXXX) at the end of a streamed string
+TRAILING_ESCAPE_PATTERN = re.compile(r'(\\+)(u[0-9a-fA-F]{0,3})?$')
+# The unescaped quote that closes a JSON string
+STRING_END_PATTERN = re.compile(r'(?<!\\)(?:\\\\)*"')
+
+
+class ResponseTextReader:
+    """
+    Incrementally extracts the "response_text" value from a streamed JSON reply.
+
+    feed() takes the next piece of the raw reply and returns the newly
+    decoded part of the value, so the text can be shown while Gemini is
+    still writing the rest of the object.
+    """
+
+    def __init__(self):
+        self._raw = ""
+        self._start = None  # Index of the value's first character in _raw
+        self._sent = 0  # Characters of the decoded value already returned
+        self._closed = False
+
+    def feed(self, text: str) -> str:
+        self._raw += text
+        if self._closed:
+            return ""
+        if self._start is None:
+            match = RESPONSE_TEXT_PATTERN.search(self._raw)
+            if match is None:
+                return ""
+            self._start = match.end()
+
+        value = self._raw[self._start:]
+        end = STRING_END_PATTERN.search(value)
+        if end is not None:
+            value = value[:end.end() - 1]
+            self._closed = True
+        else:
+            # An odd run of backslashes ends in an escape that isn't complete yet
+            trailing = TRAILING_ESCAPE_PATTERN.search(value)
+            if trailing is not None and len(trailing.group(1)) % 2:
+                value = value[:trailing.end(1) - 1]
+        try:
+            decoded = json.loads(f'"{value}"')
+        except ValueError:
+            return ""
+        if not self._closed and decoded and '\ud800' <= decoded[-1] <= '\udbff':
+            # A high surrogate whose low half is in the next piece; sending
+            # it alone would lose the character
+            decoded = decoded[:-1]
+        delta = decoded[self._sent:]
+        self._sent = len(decoded)
+        return delta
 
 
 class Recommender:
     """Recommendation engine using CLIP embeddings for similarity search."""
 
-    def __init__(self, model: CLIPModel, embeddings_df: pd.DataFrame):
+    def __init__(
+            self,
+            model: CLIPModel,
+            embeddings_df: pd.DataFrame,
+            embeddings: Optional[np.ndarray] = None,
+            index_cache_stem: Optional[str] = None
+    ):
         """
         Initialize recommender with model, embeddings, and Gemini.
+
+        embeddings may hold the (N, D) matrix for the rows of embeddings_df
+        (e.g. memory-mapped from disk); otherwise the 'vector' column is used.
+        index_cache_stem lets the similarity index persist a built graph.
         """
         self.model = model
-        self.embeddings_df = self._prepare_embeddings(embeddings_df)
+        self.embeddings_df, vectors = self._prepare_embeddings(embeddings_df, embeddings)
+        # Response image URL per product (local IKEA image, else the remote
+        # one), built once instead of per recommended row
+        image_file = self.embeddings_df['image_file']
+        self.embeddings_df['item_img'] = self.embeddings_df['image_url'].where(
+            image_file.isna(), IKEA_IMAGES_URL + '/' + image_file.astype(str)
+        )
+        self.index = SimilarityIndex(vectors, cache_stem=index_cache_stem)
+        # Row positions per catalog category, so category filters are a dict
+        # lookup instead of a string comparison over every row.
+        self._category_positions = self.embeddings_df.groupby('item_cat', dropna=False).indices
+        self._resolve_category_cached = lru_cache(maxsize=256)(self._resolve_category)
+        # Google Shopping results per query; repeated searches skip the API
+        self._shopping_cache = TTLCache(maxsize=256, ttl=GOOGLE_SHOPPING_CACHE_TTL)
+        self._shopping_lock = threading.Lock()
+        # Gemini query analyses and dimension estimates. Only parsed replies
+        # are kept, so a failed call is retried on the next request.
+        self._analysis_cache = LRUCache(maxsize=QUERY_ANALYSIS_CACHE_SIZE)
+        self._analysis_lock = threading.Lock()
+        # Keep-alive connections to Serper.dev, so repeat searches skip the TLS handshake
+        self._http = requests.Session()
 
         # 1. טעינת קובץ ה-env
         load_dotenv()
@@ -48,68 +142,128 @@ class Recommender:
                 self.client = None
 
         # --- חילוץ מידות מה-CSV של איקאה בעת הטעינה ---
-        def extract_dimensions(name):
-            # מחפש תבנית של מספרים כמו 160x200 בתוך שם המוצר
-            if not isinstance(name, str): return None, None
-            match = re.search(r'(\d+)\s*[xX*]\s*(\d+)', name)
-            if match:
-                return int(match.group(1)), int(match.group(2))
-            return None, None
-
+        # מחפש תבנית של מספרים כמו 160x200 בתוך שם המוצר (NaN when absent)
         if 'item_name' in self.embeddings_df.columns:
             print("📏 Extracting dimensions from IKEA catalog...")
-            dims = self.embeddings_df['item_name'].map(extract_dimensions)
-            self.embeddings_df['width'], self.embeddings_df['length'] = zip(*dims)
+            dims = self.embeddings_df['item_name'].str.extract(DIMENSIONS_PATTERN).astype(float)
+            self.embeddings_df['width'], self.embeddings_df['length'] = dims[0], dims[1]
+        # Plain arrays for scoring search hits by position
+        no_dims = np.full(len(self.embeddings_df), np.nan)
+        self._widths = self.embeddings_df['width'].to_numpy(dtype=float) if 'width' in self.embeddings_df else no_dims
+        self._lengths = self.embeddings_df['length'].to_numpy(dtype=float) if 'length' in self.embeddings_df else no_dims
 
     @staticmethod
-    def _prepare_embeddings(embeddings_df: pd.DataFrame) -> pd.DataFrame:
-        """Filter and prepare embeddings DataFrame."""
-        valid_df = embeddings_df[embeddings_df['vector'].notna()].copy()
+    def _prepare_embeddings(
+            embeddings_df: pd.DataFrame,
+            embeddings: Optional[np.ndarray] = None
+    ) -> tuple[pd.DataFrame, np.ndarray]:
+        """
+        Filter the embeddings DataFrame and split off its vectors.
+
+        Returns:
+            Tuple of (product metadata without the 'vector' column,
+            contiguous float32 matrix with one row per product)
+        """
+        if embeddings is not None:
+            if len(embeddings) != len(embeddings_df):
+                raise ValueError("embeddings must have one row per DataFrame row")
+            if len(embeddings) == 0:
+                raise ValueError("No valid embeddings found in DataFrame")
+            return embeddings_df.reset_index(drop=True), embeddings
+
+        valid_df = embeddings_df[embeddings_df['vector'].notna()].reset_index(drop=True)
         if valid_df.empty:
             raise ValueError("No valid embeddings found in DataFrame")
-        return valid_df
+        vectors = np.array(valid_df['vector'].tolist(), dtype=np.float32)
+        return valid_df.drop(columns=['vector']), vectors
+
+    def _resolve_category(self, target_cat: str) -> Optional[np.ndarray]:
+        """
+        Row positions for a category filter (memoized per filter in __init__).
+
+        An exact category name wins; otherwise every category containing the
+        simplified search term matches. Returns None when nothing matches.
+        """
+        positions = self._category_positions.get(target_cat)
+        if positions is not None:
+            return positions
+
+        search_term = target_cat.lower().replace("frame", "").replace("dining", "").strip()
+        # Match against the distinct category names, not every catalog row
+        matching = [
+            rows for cat, rows in self._category_positions.items()
+            if search_term in str(cat).lower()
+        ]
+        if not matching:
+            return None
+        return np.sort(np.concatenate(matching))
+
+    def warmup(self) -> None:
+        """
+        Run CLIP and one search of each kind on dummy inputs.
+
+        This pages in the memory-mapped catalog vectors and any loaded
+        FAISS index, and starts the BLAS/OpenMP thread pools, before the
+        first request.
+        """
+        self.model.warmup()
+        query_vector = self.model.encode_text('a photo of a sofa')
+        category = next(iter(self._category_positions), None)
+        self.recommend(query_vector=query_vector)
+        self.recommend(query_vector=query_vector, category_filter=category, precomputed_dims=(100, 100))
+
+    def encode_query_text(self, query_text: str) -> np.ndarray:
+        """Encode the text part of a query (expanded with its style description)."""
+        return self.model.encode_text(get_style_description(query_text))
 
-    def _encode(
+    def encode_query(
             self,
             query_text: Optional[str] = None,
             query_image_path: Optional[str] = None,
-            alpha: float = 0.5
+            alpha: float = 0.5,
+            text_embedding: Optional[np.ndarray] = None
     ) -> np.ndarray:
-        """Encode query (text and/or image) into embedding vector."""
+        """
+        Encode query (text and/or image) into a float32 embedding vector.
+
+        text_embedding may be passed when the caller already ran
+        encode_query_text (e.g. concurrently with detection).
+        """
+        if query_text and text_embedding is None:
+            text_embedding = self.encode_query_text(query_text)
         if query_text and query_image_path:
-            query_text = get_style_description(query_text)
-            text_embedding = np.array(self.model.encode_text(query_text))
-            image_embedding = np.array(self.model.encode_image(query_image_path))
-            combined = alpha * text_embedding + (1 - alpha) * image_embedding
-            return combined.flatten()
+            image_embedding = self.model.encode_image(query_image_path)
+            # Blend into one float32 buffer; the image embedding is a fresh
+            # array, so it can be scaled in place
+            combined = np.multiply(text_embedding, np.float32(alpha))
+            image_embedding *= np.float32(1 - alpha)
+            combined += image_embedding
+            return combined
         elif query_text:
-            query_text = get_style_description(query_text)
-            text_embedding = np.array(self.model.encode_text(query_text))
-            return text_embedding.flatten()
+            return text_embedding
         elif query_image_path:
-            image_embedding = np.array(self.model.encode_image(query_image_path))
-            return image_embedding.flatten()
+            return self.model.encode_image(query_image_path)
         else:
             raise ValueError("Either query_text or query_image_path must be provided")
 
-    def _calculate_similarities(
-            self,
-            query_vector: np.ndarray,
-            product_vectors: np.ndarray
-    ) -> np.ndarray:
-        """Calculate cosine similarities."""
-        query_norm = query_vector / (np.linalg.norm(query_vector) + 1e-8)
-        product_norms = product_vectors / (np.linalg.norm(product_vectors, axis=1, keepdims=True) + 1e-8)
-        similarities = np.dot(product_norms, query_norm)
-        return similarities
-
     def analyze_query(self, query_text: str, image_path: Optional[str] = None):
         """
         Analyses both text and image in ONE Gemini call to save time.
+
+        Returns (category, width, length), or None when the Gemini call
+        failed, so callers can tell a transient failure from "no category".
         """
         if not self.client:
             return "None", None, None
 
+        # Images are crops under content-hashed directories, so the path
+        # identifies the pixels
+        cache_key = ('analysis', (query_text or '').strip().lower(), image_path)
+        with self._analysis_lock:
+            cached = self._analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             prompt = """
             You are a furniture expert. Analyze the user request and image.
@@ -118,7 +272,7 @@ class Recommender:
             
             contents = [prompt]
             if query_text: contents.append(f"User request: {query_text}")
-            if image_path: contents.append(Image.open(image_path))
+            if image_path: contents.append(image_part(image_path))
                 
             response = self.client.models.generate_content(
                 model=self.model_name,
@@ -126,15 +280,18 @@ class Recommender:
                 config=types.GenerateContentConfig(temperature=0.1)
             )
             
-            json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
+            json_match = JSON_OBJECT_PATTERN.search(response.text)
             if json_match:
                 data = json.loads(json_match.group())
-                return data.get('category', 'None'), data.get('width'), data.get('length')
+                result = data.get('category', 'None'), data.get('width'), data.get('length')
+                with self._analysis_lock:
+                    self._analysis_cache[cache_key] = result
+                return result
                 
         except Exception as e:
             print(f"⚠️ Error in combined analysis: {e}")
             
-        return "None", None, None
+        return None
 
     def recommend(
             self,
@@ -143,38 +300,29 @@ class Recommender:
             top_k: int = 10,
             alpha: float = 0.5,
             category_filter=None,
-            precomputed_dims=(None, None)
+            precomputed_dims=(None, None),
+            query_vector: Optional[np.ndarray] = None
     ) -> pd.DataFrame:
         """
         Get top-k recommendations with SMART category filtering.
+
+        query_vector may be passed when the caller already ran encode_query
+        (e.g. concurrently with another call) to skip encoding here.
         """
         # 1. יצירת וקטור חיפוש
-        query_vector = self._encode(query_text, query_image_path, alpha)
-
-        df_to_search = self.embeddings_df.copy()
+        if query_vector is None:
+            query_vector = self.encode_query(query_text, query_image_path, alpha)
 
         # 2. לוגיקת סינון קטגוריה משופרת (Smart Filtering)
+        # positions stays None when the whole catalog is searched
+        positions = None
         target_cat = category_filter
         if target_cat and target_cat != 'None':
             print(f"🔍 Trying to filter by category: '{target_cat}'")
             # ... (rest of filtering logic)
-            exact_match = df_to_search[df_to_search['item_cat'] == target_cat]
-            if len(exact_match) > 0:
-                df_to_search = exact_match
-            else:
-                search_term = target_cat.lower().replace("frame", "").replace("dining", "").strip()
-                partial_match = df_to_search[
-                    df_to_search['item_cat'].astype(str).str.lower().str.contains(search_term, regex=False)
-                ]
-                if len(partial_match) > 0:
-                    df_to_search = partial_match
-
-        # 3. חישוב דמיון ויזואלי
-        product_vectors = np.array([v for v in df_to_search['vector'].values])
-        similarities = self._calculate_similarities(query_vector, product_vectors)
-        df_to_search['similarity'] = similarities
-
-        # 4. שימוש במידות שהוערכו מראש (כדי לחסוך קריאת API)
+            positions = self._resolve_category_cached(target_cat)
+
+        # 3. שימוש במידות שהוערכו מראש (כדי לחסוך קריאת API)
         target_w, target_l = precomputed_dims
         
         # אם לא הועברו מידות, והמשתמש לא סיפק קטגוריה (שאולי כבר הכילה מידות), מנסים פעם אחרונה
@@ -182,21 +330,52 @@ class Recommender:
              # רק אם ממש חייבים, עושים קריאה נפרדת (אבל בשימוש נכון זה לא יקרה)
              target_w, target_l = self.estimate_dimensions(query_image_path)
 
-        def calculate_final_score(row):
-            score = row['similarity']
-            if target_w is None or pd.isna(row.get('width')):
-                return score
-            diff_w = abs(row['width'] - target_w) / max(target_w, 1)
-            diff_l = abs(row['length'] - target_l) / max(target_l, 1)
+        # 4. חישוב דמיון ויזואלי
+        # Without a size penalty the ranking is pure similarity, so the index
+        # only has to return top_k rows. The penalty never raises a score, so
+        # with it the search widens until the next unseen similarity can't
+        # beat the current top_k final scores.
+        # Only the rows returned by the index are materialized as a DataFrame.
+        candidates = self.index.size if positions is None else len(positions)
+        k = top_k if target_w is None else min(candidates, 4 * top_k)
+        while True:
+            hit_positions, similarities = self.index.search(query_vector, k, positions)
+            scores = similarities
+            if target_w is None:
+                break
+            # Size penalty for products whose name carries dimensions; the
+            # rest keep their plain similarity
+            widths, lengths = self._widths[hit_positions], self._lengths[hit_positions]
+            diff_w = np.abs(widths - target_w) / max(target_w, 1)
+            diff_l = np.abs(lengths - target_l) / max(target_l, 1)
             penalty = (diff_w + diff_l) / 2
-            return score - (penalty * 0.4)
-
-        df_to_search['final_score'] = df_to_search.apply(calculate_final_score, axis=1)
-        top_results = df_to_search.sort_values('final_score', ascending=False).head(top_k).copy()
+            scores = np.where(np.isnan(widths), similarities, similarities - penalty * 0.4)
+            if k >= candidates or (
+                    len(scores) >= top_k and similarities[-1] < np.partition(scores, -top_k)[-top_k]
+            ):
+                break
+            k = min(candidates, 4 * k)
+
+        df_to_search = self.embeddings_df.iloc[hit_positions].assign(similarity=similarities)
+        df_to_search['final_score'] = scores
+        top_results = df_to_search.nlargest(top_k, 'final_score')
         return top_results
 
     def search_google_shopping(self, query: str) -> list[dict]:
-        """Google Shopping search using Serper.dev API."""
+        """Google Shopping search using Serper.dev API (cached per query)."""
+        with self._shopping_lock:
+            cached = self._shopping_cache.get(query)
+        if cached is not None:
+            return [dict(product) for product in cached]
+
+        products = self._fetch_google_shopping(query)
+        if products:
+            with self._shopping_lock:
+                self._shopping_cache[query] = [dict(product) for product in products]
+        return products
+
+    def _fetch_google_shopping(self, query: str) -> list[dict]:
+        """Call the Serper.dev shopping endpoint."""
         url = "https://google.serper.dev/shopping"
         api_key = os.getenv("SERPER_API_KEY")
 
@@ -208,7 +387,7 @@ class Recommender:
         headers = {"X-API-KEY": api_key, "Content-Type": "application/json"}
 
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=20)
+            response = self._http.post(url, headers=headers, json=payload, timeout=20)
             response.raise_for_status()
             results = response.json()
 
@@ -234,90 +413,131 @@ class Recommender:
             print(f"❌ Error searching Google Shopping: {e}")
             return []
 
+    def _chat_contents(self, image_path, messages) -> list:
+        """Prompt (with the chat history) and optional room image for a designer chat turn."""
+        history_text = "Chat History:\n"
+        for msg in messages:
+            role = "User" if msg['role'] == "user" else "CasAI"
+            history_text += f"{role}: {msg['content']}\n"
+
+        prompt = f"""
+        You are CasAI, an expert interior designer. Analyze the situation and answer the user's questions.
+        Be helpful, concise, and professional. If the user asks in Hebrew, answer in Hebrew.
+        
+        IMPORTANT DIRECTIONS:
+        1. Your advice should be specific. If you suggest a piece of furniture, describe its style, material, and color.
+        2. For every specific piece of furniture you recommend in your text, you MUST provide a highly descriptive search query in the 'search_queries' list.
+        3. The 'search_queries' should be in English and include the type, style, and color (e.g., "minimalist black metal coffee table" instead of just "table").
+        4. Your response MUST be a valid JSON object.
+        
+        JSON format:
+        {{
+          "response_text": "Your helpful text response here (in Hebrew if the user asked in Hebrew)...",
+          "search_queries": ["descriptive search term 1", "descriptive search term 2"] 
+        }}
+
+        {history_text}
+        CasAI (Response in JSON):
+        """
+        
+        contents = [prompt]
+        if image_path and os.path.exists(image_path):
+            try:
+                contents.append(image_part(image_path))
+            except:
+                pass
+        return contents
+
+    def _chat_result(self, reply: str) -> dict:
+        """Parse a designer reply into its text and catalog items for its search queries."""
+        # Extract JSON from response
+        json_text = reply.strip()
+        if "```json" in json_text:
+            json_text = json_text.split("```json")[1].split("```")[0].strip()
+        elif "```" in json_text:
+            json_text = json_text.split("```")[1].strip()
+        
+        try:
+            data = json.loads(json_text)
+            response_text = data.get("response_text", "")
+            search_queries = data.get("search_queries", [])
+            
+            all_recs = []
+            if search_queries:
+                # Embed every query in one batched forward pass
+                query_vectors = self.model.encode_texts(
+                    [get_style_description(query) for query in search_queries]
+                )
+                for query, query_vector in zip(search_queries, query_vectors):
+                    # Search for the best matches in our database
+                    recs = self.recommend(query_text=query, top_k=2, query_vector=query_vector)
+                    all_recs.extend(
+                        recs[['item_name', 'item_price', 'product_link', 'item_img']]
+                        .rename(columns={'product_link': 'item_url'})
+                        .to_dict(orient='records')
+                    )
+
+            return {
+                "text": response_text,
+                "recommendations": all_recs
+            }
+        except:
+            # Fallback if Gemini returns plain text instead of JSON
+            return {
+                "text": reply,
+                "recommendations": []
+            }
+
     def chat_with_designer(self, image_path, messages):
         """ניהול שיחה עם Gemini והצעת פריטים מהמאגר באופן אוטומטי."""
         if not self.client:
             return {"text": "Designer service not available. Please check your API key.", "recommendations": []}
             
         try:
-            history_text = "Chat History:\n"
-            for msg in messages:
-                role = "User" if msg['role'] == "user" else "CasAI"
-                history_text += f"{role}: {msg['content']}\n"
-
-            prompt = f"""
-            You are CasAI, an expert interior designer. Analyze the situation and answer the user's questions.
-            Be helpful, concise, and professional. If the user asks in Hebrew, answer in Hebrew.
-            
-            IMPORTANT DIRECTIONS:
-            1. Your advice should be specific. If you suggest a piece of furniture, describe its style, material, and color.
-            2. For every specific piece of furniture you recommend in your text, you MUST provide a highly descriptive search query in the 'search_queries' list.
-            3. The 'search_queries' should be in English and include the type, style, and color (e.g., "minimalist black metal coffee table" instead of just "table").
-            4. Your response MUST be a valid JSON object.
-            
-            JSON format:
-            {{
-              "response_text": "Your helpful text response here (in Hebrew if the user asked in Hebrew)...",
-              "search_queries": ["descriptive search term 1", "descriptive search term 2"] 
-            }}
-
-            {history_text}
-            CasAI (Response in JSON):
-            """
-            
-            contents = [prompt]
-            if image_path and os.path.exists(image_path):
-                try:
-                    contents.append(Image.open(image_path))
-                except:
-                    pass
-            
             response = self.client.models.generate_content(
                 model=self.model_name,
-                contents=contents,
+                contents=self._chat_contents(image_path, messages),
                 config=types.GenerateContentConfig(temperature=0.1)
             )
-            
-            # Extract JSON from response
-            json_text = response.text.strip()
-            if "```json" in json_text:
-                json_text = json_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in json_text:
-                json_text = json_text.split("```")[1].strip()
-            
-            try:
-                data = json.loads(json_text)
-                response_text = data.get("response_text", "")
-                search_queries = data.get("search_queries", [])
-                
-                all_recs = []
-                if search_queries:
-                    for query in search_queries:
-                        # Search for the best matches in our database
-                        recs = self.recommend(query_text=query, top_k=2)
-                        for _, row in recs.iterrows():
-                            all_recs.append({
-                                'item_name': row.get('item_name', ''),
-                                'item_price': row.get('item_price', ''),
-                                'item_url': row.get('product_link', ''),
-                                'item_img': f"/data/ikea_il_images/{row['image_file']}" if pd.notna(row.get('image_file')) else row.get('image_url', '')
-                            })
-
-                return {
-                    "text": response_text,
-                    "recommendations": all_recs
-                }
-            except:
-                # Fallback if Gemini returns plain text instead of JSON
-                return {
-                    "text": response.text,
-                    "recommendations": []
-                }
+            return self._chat_result(response.text)
 
         except Exception as e:
             print(f"Gemini Error: {e}")
             return {"text": "Sorry, I'm having trouble thinking right now. Let's try again in a moment.", "recommendations": []}
 
+    def chat_with_designer_stream(self, image_path, messages) -> Iterator[dict]:
+        """
+        Streaming variant of chat_with_designer.
+
+        Yields {"delta": str} events with the reply text as Gemini generates
+        it, then one final {"done": True, "text": ..., "recommendations": ...}
+        event with the same content chat_with_designer returns.
+        """
+        if not self.client:
+            yield {"done": True, **self.chat_with_designer(image_path, messages)}
+            return
+
+        reply = ""
+        reader = ResponseTextReader()
+        try:
+            stream = self.client.models.generate_content_stream(
+                model=self.model_name,
+                contents=self._chat_contents(image_path, messages),
+                config=types.GenerateContentConfig(temperature=0.1)
+            )
+            for chunk in stream:
+                if not chunk.text:
+                    continue
+                reply += chunk.text
+                delta = reader.feed(chunk.text)
+                if delta:
+                    yield {"delta": delta}
+            result = self._chat_result(reply)
+        except Exception as e:
+            print(f"Gemini Error: {e}")
+            result = {"text": "Sorry, I'm having trouble thinking right now. Let's try again in a moment.", "recommendations": []}
+        yield {"done": True, **result}
+
     def estimate_dimensions(self, image_path):
         """
         משתמש ב-Gemini להערכת מידות הרהיט מהתמונה.
@@ -325,8 +545,14 @@ class Recommender:
         if not self.client:
             return None, None
 
+        cache_key = ('dimensions', str(image_path))
+        with self._analysis_lock:
+            cached = self._analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            img = Image.open(image_path)
+            img = image_part(image_path)
             prompt = """
             Analyze the furniture in this image. 
             Based on standard furniture sizes and room proportions, estimate its:
@@ -341,10 +567,13 @@ class Recommender:
                 config=types.GenerateContentConfig(temperature=0.1)
             )
 
-            json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
+            json_match = JSON_OBJECT_PATTERN.search(response.text)
             if json_match:
                 data = json.loads(json_match.group())
-                return data.get('width'), data.get('length')
+                result = data.get('width'), data.get('length')
+                with self._analysis_lock:
+                    self._analysis_cache[cache_key] = result
+                return result
 
         except Exception as e:
             print(f"⚠️ Error estimating dimensions: {e}")
@@ -0,0 +1,289 @@
+"""Cosine-similarity search over the IKEA catalog embeddings."""
+
+import math
+import os
+import re
+from pathlib import Path
+from typing import Optional, Union
+import numpy as np
+
+from .config import (
+    EMBEDDING_PRECISION,
+    EMBEDDING_INDEX,
+    HNSW_M,
+    HNSW_EF_SEARCH,
+    IVF_NLIST,
+    IVF_NPROBE,
+    PQ_M,
+    REFINE_K_FACTOR,
+    NUMBA_SCAN_MIN_ROWS,
+)
+
+try:
+    import faiss
+except ImportError:  # FAISS is optional; fall back to a NumPy scan
+    faiss = None
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional (the no-faiss extra); filtered scans use NumPy fancy indexing
+    njit = None
+
+try:
+    import simsimd
+except ImportError:  # SimSIMD is optional (the no-faiss extra); fp16/int8 scans widen for NumPy instead
+    simsimd = None
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _gather_dot(vectors, rows, query, out):
+        """out[j] = vectors[rows[j]] . query, without copying the gathered rows."""
+        for j in prange(rows.shape[0]):
+            row = rows[j]
+            acc = np.float32(0.0)
+            for d in range(vectors.shape[1]):
+                acc += vectors[row, d] * query[d]
+            out[j] = acc
+
+
+def _simd_dot(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """vectors @ query with SimSIMD's native kernels, as float32."""
+    return np.asarray(simsimd.cdist(query[None, :], vectors, metric='dot', out_dtype='float32'))[0]
+
+
+def row_norms(vectors: np.ndarray) -> np.ndarray:
+    """L2 norm of each row, as one fused multiply-add reduction per row."""
+    return np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
+
+
+class SimilarityIndex:
+    """Nearest-neighbour search over a fixed matrix of product embeddings.
+
+    Stored vectors are always L2-normalized, so cosine similarity reduces to
+    an inner product. Input that is already normalized (e.g. the memory-mapped
+    catalog matrix) is used as is; anything else is normalized into a copy. When FAISS is installed the search runs on
+    a FAISS index; otherwise a single NumPy matrix-vector product is used.
+    With ``precision='float16'`` vectors are stored in half precision (a FAISS
+    ``SQfp16`` index, or without FAISS a float16 matrix scanned with SimSIMD
+    when installed); with ``precision='int8'``
+    they are stored as per-row quantized codes (a FAISS ``SQ8`` index, or
+    without FAISS int8 codes plus scales, with SimSIMD's integer dot products
+    when installed). The NumPy paths and their kernels (the ``no-faiss``
+    extra) are only used when faiss-cpu is not installed.
+    With ``index_type='hnsw'`` and FAISS available, unfiltered top-k queries
+    walk an HNSW graph instead of scanning every vector. With
+    ``index_type='ivfpq'`` they scan a few inverted lists of product-quantized
+    codes and rerank the best candidates against the stored vectors.
+    Given a cache_stem, a built graph or trained IVF-PQ index is saved next
+    to it and reloaded on the next start.
+    """
+
+    PRECISIONS = ('float32', 'float16', 'int8')
+    _FAISS_STORAGE = {'float32': 'Flat', 'float16': 'SQfp16', 'int8': 'SQ8'}
+    INDEX_TYPES = ('flat', 'hnsw', 'ivfpq')
+
+    def __init__(
+            self,
+            vectors: np.ndarray,
+            precision: str = EMBEDDING_PRECISION,
+            index_type: str = EMBEDDING_INDEX,
+            cache_stem: Optional[Union[str, Path]] = None
+    ):
+        """
+        Build the index.
+
+        Args:
+            vectors: (N, D) matrix of product embeddings, one row per product
+            precision: Storage precision, one of PRECISIONS
+            index_type: Search structure, one of INDEX_TYPES
+            cache_stem: Path prefix for persisting an HNSW/IVF-PQ index
+                ("<cache_stem>.<description>.faiss"); None disables it
+
+        Raises:
+            ValueError: If precision or index_type is not supported
+        """
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"Unsupported embedding precision: {precision}")
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"Unsupported index type: {index_type}")
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = row_norms(vectors)
+        if not np.allclose(norms, 1.0, atol=1e-4):
+            vectors = vectors / (norms[:, None] + 1e-8)
+        self.size, self.dim = vectors.shape
+        self.precision = precision
+        self.index_type = index_type
+
+        self.vectors = None
+        self._codes = None
+        self._scales = None
+        self._index = None
+        self._exact_index = None
+        if faiss is not None:
+            self._index = self._load_or_build_faiss_index(vectors, cache_stem)
+            # The HNSW storage and the IVF-PQ reranker are plain flat/SQ
+            # indexes over every vector, so they can be scanned exactly
+            if index_type == 'hnsw':
+                self._exact_index = faiss.downcast_index(self._index.storage)
+            elif index_type == 'ivfpq':
+                self._exact_index = faiss.downcast_index(self._index.refine_index)
+            else:
+                self._exact_index = self._index
+        elif precision == 'int8':
+            self._codes, self._scales = self._quantize(vectors)
+        elif precision == 'float16':
+            self.vectors = vectors.astype(np.float16)
+        else:
+            self.vectors = vectors
+            if njit is not None:
+                # Compile (or load the cached build) now rather than on a request
+                self._gather_scan(np.zeros(self.dim, dtype=np.float32), np.zeros(1, dtype=np.int64))
+
+    def _faiss_description(self) -> str:
+        """FAISS index_factory string for the configured precision and type."""
+        storage = self._FAISS_STORAGE[self.precision]
+        if self.index_type == 'hnsw':
+            return f"HNSW{HNSW_M},{storage}"
+        if self.index_type == 'ivfpq':
+            # Candidates from the PQ codes are reranked on the stored vectors
+            return f"IVF{IVF_NLIST},PQ{PQ_M},Refine({storage})"
+        return storage
+
+    def _configure_faiss_index(self, index) -> None:
+        """Apply the search-time parameters, which are not part of a saved index."""
+        if self.index_type == 'hnsw':
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+        elif self.index_type == 'ivfpq':
+            index.k_factor = REFINE_K_FACTOR
+            faiss.downcast_index(index.base_index).nprobe = IVF_NPROBE
+
+    def _load_or_build_faiss_index(self, vectors: np.ndarray, cache_stem):
+        """
+        Reuse a persisted HNSW/IVF-PQ index when one matches, otherwise build it.
+
+        Flat indexes are not persisted: filling one is a copy, while building
+        the HNSW graph or training IVF-PQ is the expensive part of startup.
+        """
+        if cache_stem is None or self.index_type == 'flat':
+            return self._build_faiss_index(vectors)
+
+        slug = re.sub(r'[^0-9A-Za-z]+', '_', self._faiss_description()).strip('_')
+        index_path = Path(f"{cache_stem}.{slug}.faiss")
+        if index_path.exists():
+            index = faiss.read_index(str(index_path))
+            if index.ntotal == self.size and index.d == self.dim:
+                self._configure_faiss_index(index)
+                return index
+
+        index = self._build_faiss_index(vectors)
+        tmp_path = index_path.with_name(index_path.name + '.tmp')
+        faiss.write_index(index, str(tmp_path))
+        os.replace(tmp_path, index_path)
+        return index
+
+    def _build_faiss_index(self, vectors: np.ndarray):
+        """Create and fill the FAISS index for the configured precision and type."""
+        index = faiss.index_factory(self.dim, self._faiss_description(), faiss.METRIC_INNER_PRODUCT)
+        if self.index_type == 'ivfpq':
+            # Polysemous codes only help searches that set a Hamming threshold,
+            # which these don't, and training them dominates the build time
+            faiss.downcast_index(index.base_index).do_polysemous_training = False
+        if not index.is_trained:
+            index.train(vectors)
+        index.add(vectors)
+        self._configure_faiss_index(index)
+        return index
+
+    @staticmethod
+    def _quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Symmetric per-row int8 quantization (NumPy fallback only), returns (codes, scales)."""
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _gather_scan(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Similarities for the selected rows via the parallel Numba kernel."""
+        out = np.empty(len(rows), dtype=np.float32)
+        _gather_dot(self.vectors, np.ascontiguousarray(rows, dtype=np.int64), query, out)
+        return out
+
+    def _scan(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Exact similarities between the query and the selected rows (all if None)."""
+        if self._codes is None:
+            vectors = self.vectors
+            if vectors.dtype == np.float16:
+                selected = vectors if rows is None else vectors[rows]
+                if simsimd is not None:
+                    # Native fp16 dot products, accumulated in float32
+                    return _simd_dot(query.astype(np.float16), selected)
+                # No half-precision BLAS; widen the selected rows and accumulate in float32
+                return selected.astype(np.float32) @ query
+            if njit is not None and rows is not None and len(rows) >= NUMBA_SCAN_MIN_ROWS:
+                return self._gather_scan(query, rows)
+            if rows is None:
+                return vectors @ query
+            return vectors[rows] @ query
+
+        query_codes, query_scale = self._quantize(query[None, :])
+        codes, scales = (self._codes, self._scales) if rows is None else (self._codes[rows], self._scales[rows])
+        if simsimd is not None:
+            # Integer dot products on the int8 codes (VNNI where available)
+            dots = _simd_dot(query_codes[0], codes)
+        else:
+            # int8 products overflow int16 over D dims, so accumulate in int32
+            dots = codes.astype(np.int32) @ query_codes[0].astype(np.int32)
+        return dots * scales * query_scale[0]
+
+    def search(
+            self,
+            query_vector: np.ndarray,
+            k: int,
+            positions: Optional[np.ndarray] = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find the rows most similar to the query.
+
+        Args:
+            query_vector: Query embedding of shape (D,)
+            k: Number of results to return
+            positions: Optional row positions to restrict the search to
+
+        Returns:
+            Tuple of (row positions, cosine similarities), best match first
+        """
+        # Scalar norm in Python floats, then a single scaled copy (float32 is kept)
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        query = (query * (1.0 / (math.sqrt(query.dot(query)) + 1e-8)))[None, :]
+        candidates = self.size if positions is None else len(positions)
+        k = min(k, candidates)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if self._index is not None:
+            # Filtered and large-k searches scan exactly; a graph only pays
+            # off for a small unfiltered top-k (and can miss filtered rows).
+            index = self._index
+            params = None
+            if positions is not None:
+                index = self._exact_index
+                selector = faiss.IDSelectorBatch(np.asarray(positions, dtype=np.int64))
+                params = faiss.SearchParameters(sel=selector)
+            elif k >= self.size // 2:
+                index = self._exact_index
+            similarities, labels = index.search(query, k, params=params)
+            found = labels[0] >= 0
+            return labels[0][found], similarities[0][found]
+
+        similarities = self._scan(query[0], positions)
+        if k < len(similarities):
+            # Partition out the top k in O(N), then sort only those k
+            top = np.argpartition(-similarities, k - 1)[:k]
+            order = top[np.argsort(-similarities[top])]
+        else:
+            order = np.argsort(-similarities)
+        if positions is not None:
+            return np.asarray(positions)[order], similarities[order]
+        return order, similarities[order]
@@ -2,14 +2,24 @@
 
 import os
 import cv2
-from typing import Optional
-from PIL import Image
+import numpy as np
+import torch
+from typing import Optional, Union
+from PIL import Image, ImageOps
 from ultralytics import YOLO
 
 from .config import (
     YOLO_CONF_THRESHOLD,
-    YOLO_MODEL_NAME
+    CLIP_IMAGE_SIZE,
+    YOLO_MAX_DETECTIONS,
+    YOLO_MAX_BATCH,
+    YOLO_BATCH_TIMEOUT,
+    GPU_HALF_PRECISION,
+    YOLO_MODEL_NAME,
+    crop_thumb_path,
+    file_path_to_url
 )
+from .batching import BatchScheduler
 
 
 class YOLODetectionService:
@@ -33,46 +43,109 @@ class YOLODetectionService:
             self.yolo_model = yolo_model
         else:
             self.yolo_model = self.load_model(model_path)
+        # First GPU when available; half only takes effect for backends that
+        # support it (an fp32 ONNX export keeps its own input precision)
+        self.device = 0 if torch.cuda.is_available() else 'cpu'
+        self.half = GPU_HALF_PRECISION and self.device != 'cpu'
+        # All predictions go through one worker thread, batched across requests
+        self.scheduler = BatchScheduler(
+            self._predict_batch, YOLO_MAX_BATCH, YOLO_BATCH_TIMEOUT, name="yolo-predict"
+        )
+
+    def _predict_batch(self, requests: list[tuple]) -> list:
+        """
+        Run one YOLO prediction over queued (source, conf_threshold) requests.
+
+        The batch is predicted at the lowest requested threshold; each caller
+        filters its own result by its threshold afterwards.
+        """
+        sources = [source for source, _ in requests]
+        return self.yolo_model.predict(
+            source=sources,
+            conf=min(conf for _, conf in requests),
+            device=self.device,
+            half=self.half,
+            verbose=False
+        )
+
+    def warmup(self, runs: int = 2) -> None:
+        """
+        Predict on blank frames so the first request doesn't pay for setup.
+
+        Ultralytics creates the inference session on the first predict call,
+        and CUDA backends select kernels on the first few runs.
+        """
+        blank = np.zeros((640, 640, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.scheduler.submit((blank, YOLO_CONF_THRESHOLD))
 
     def detect_furniture(
         self,
-        image_path: str,
+        image: Union[str, bytes, np.ndarray, Image.Image],
         save_dir: str,
-        conf_threshold: float = YOLO_CONF_THRESHOLD
+        conf_threshold: float = YOLO_CONF_THRESHOLD,
+        image_name: Optional[str] = None,
+        max_detections: int = YOLO_MAX_DETECTIONS,
+        return_crop_bytes: bool = False
     ) -> list[dict]:
         """
         Detect furniture in image using YOLO and save cropped images.
         Only allows items defined in FURNITURE_IDS.
+
+        Args:
+            image: Image file path, encoded image bytes, BGR ndarray, or PIL
+                image. In-memory images skip reading the file back from disk.
+            save_dir: Directory to save the cropped images in
+            conf_threshold: Base confidence threshold
+            image_name: Prefix for crop file names (defaults to the file
+                name for paths, "image" otherwise)
+            max_detections: Maximum number of crops to save and return
+            return_crop_bytes: Also return the JPEG to embed for each crop
+                under 'crop_bytes', so callers can embed it without reading
+                the file back
         """
         if not os.path.exists(save_dir):
             raise FileNotFoundError(f"Save directory does not exist: {save_dir}")
 
-        base_name = os.path.splitext(os.path.basename(image_path))[0]
-
-        imagecv = cv2.imread(image_path)
-        if imagecv is None:
-            raise ValueError(f"Could not read image from {image_path}")
-
-        # YOLO prediction
-        results = self.yolo_model.predict(
-            source=imagecv,
-            conf=conf_threshold,
-            verbose=False
-        )
+        # Everything is brought to one BGR array: YOLO's native input, and the
+        # crops are plain slices of it encoded straight to JPEG by OpenCV
+        if isinstance(image, str):
+            image_name = image_name or os.path.splitext(os.path.basename(image))[0]
+            source = cv2.imread(image)
+            if source is None:
+                raise ValueError(f"Could not read image from {image}")
+        elif isinstance(image, bytes):
+            # imdecode applies EXIF orientation, like imread
+            source = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+            if source is None:
+                raise ValueError("Could not decode image bytes")
+        elif isinstance(image, Image.Image):
+            # cv2.imread applies EXIF orientation, so do the same for PIL input
+            rgb = np.asarray(ImageOps.exif_transpose(image).convert('RGB'))
+            source = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+        else:
+            source = image
+        base_name = image_name or "image"
 
-        result = results[0]
+        # YOLO prediction, possibly batched with other requests' images
+        result = self.scheduler.submit((source, conf_threshold))
         boxes = result.boxes
         detected_photos = []
 
         if boxes is not None and len(boxes) > 0:
-            img_rgb = cv2.cvtColor(imagecv, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(img_rgb)
             counter = 1
+            # One device-to-host copy per tensor instead of three per box
+            xyxy = boxes.xyxy.cpu().numpy().astype(int)
+            confidences = boxes.conf.cpu().numpy()
+            class_ids = boxes.cls.cpu().numpy().astype(int)
 
+            # Boxes come sorted by confidence, so stopping early keeps the best ones
             for i in range(len(boxes)):
-                box = boxes.xyxy[i].cpu().numpy().astype(int)
-                confidence = float(boxes.conf[i].cpu().numpy())
-                class_id = int(boxes.cls[i].cpu().numpy())
+                if len(detected_photos) >= max_detections:
+                    break
+                box = xyxy[i]
+                confidence = float(confidences[i])
+                class_id = int(class_ids[i])
 
                 # --- סינון וביטחון דינמי ---
                 if class_id not in self.FURNITURE_IDS:
@@ -93,19 +166,42 @@ class YOLODetectionService:
                 file_name = f"{base_name}_{counter}_{yolo_class_name}.jpg"
                 save_path = os.path.join(save_dir, file_name)
 
-                crop_img = pil_image.crop(tuple(box.tolist()))
-                crop_img.save(save_path)
-
-                crop_url = f"/appdata/detect/{file_name}"
-
-                detected_photos.append({
+                # Encode once in memory; the same bytes go to disk and the caller
+                x1, y1, x2, y2 = box.tolist()
+                crop = source[y1:y2, x1:x2]
+                if crop.size == 0:
+                    continue
+                _, buffer = cv2.imencode('.jpg', crop, [cv2.IMWRITE_JPEG_QUALITY, 90])
+                crop_bytes = buffer.tobytes()
+                with open(save_path, 'wb') as f:
+                    f.write(crop_bytes)
+
+                # CLIP shrinks its input to CLIP_IMAGE_SIZE anyway; store an
+                # embedding copy at that size so queries decode far fewer pixels
+                height, width = crop.shape[:2]
+                scale = CLIP_IMAGE_SIZE / min(height, width)
+                if scale < 1:
+                    thumb = cv2.resize(
+                        crop, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA
+                    )
+                    _, buffer = cv2.imencode('.jpg', thumb, [cv2.IMWRITE_JPEG_QUALITY, 90])
+                    crop_bytes = buffer.tobytes()
+                    with open(crop_thumb_path(save_path), 'wb') as f:
+                        f.write(crop_bytes)
+
+                crop_url = file_path_to_url(save_path)
+
+                detection = {
                     'File_name': file_name,
                     'class': yolo_class_name,
                     'path': save_path,
                     'bbox': box.tolist(),
                     'confidence': confidence,
                     'crop_url': crop_url,
-                })
+                }
+                if return_crop_bytes:
+                    detection['crop_bytes'] = crop_bytes
+                detected_photos.append(detection)
                 counter += 1
 
         return detected_photos
@@ -113,10 +209,20 @@ class YOLODetectionService:
 
     @staticmethod
     def load_model(model_path: Optional[str] = None) -> YOLO:
-        """Load YOLO model for furniture detection."""
-        if model_path:
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"YOLO model not found at {model_path}")
-            return YOLO(model_path, task='detect')
+        """
+        Load YOLO model for furniture detection.
+
+        On CUDA, a TensorRT engine built next to the ONNX model (see
+        yolo-train/build_engine.py) is used instead, unless it is older.
+        """
+        if model_path and not os.path.exists(model_path):
+            raise FileNotFoundError(f"YOLO model not found at {model_path}")
+        path = model_path or YOLO_MODEL_NAME
+
+        engine_path = os.path.splitext(path)[0] + '.engine'
+        if (torch.cuda.is_available() and os.path.exists(engine_path)
+                and os.path.getmtime(engine_path) >= os.path.getmtime(path)):
+            print(f"⚡ Using TensorRT engine {engine_path}")
+            path = engine_path
 
-        return YOLO(YOLO_MODEL_NAME, task='detect')
\ No newline at end of file
+        return YOLO(path, task='detect')
\ No newline at end of file
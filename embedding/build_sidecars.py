@@ -0,0 +1,37 @@
+"""Script for splitting the embeddings pickle into memory-mappable sidecar files."""
+
+import pickle
+import sys
+from pathlib import Path
+
+from core.config import EMBEDDINGS_FILE
+from core.catalog import sidecar_paths, write_sidecars
+
+
+def build_sidecars(df_path: Path = EMBEDDINGS_FILE) -> None:
+    """
+    Write the metadata pickle and float32 .npy matrix next to a catalog pickle.
+
+    The server creates these on first load anyway; running this once after
+    re-embedding keeps that work out of server startup.
+
+    Args:
+        df_path: Path to the catalog pickle. Defaults to config EMBEDDINGS_FILE.
+    """
+    print(f"📖 Reading {df_path}...")
+    with open(df_path, 'rb') as f:
+        df = pickle.load(f)
+
+    metadata, vectors = write_sidecars(df, df_path)
+    meta_path, matrix_path = sidecar_paths(df_path)
+    print(f"✅ Wrote {len(metadata)} products to {meta_path.name}")
+    print(f"✅ Wrote {vectors.shape[0]}x{vectors.shape[1]} embeddings to {matrix_path.name}")
+
+
+if __name__ == "__main__":
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else EMBEDDINGS_FILE
+    if not path.exists():
+        print(f"❌ Embeddings file not found: {path}")
+        print("   Please create embeddings first: python embedding/embed-ds.py")
+        sys.exit(1)
+    build_sidecars(path)
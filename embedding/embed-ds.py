@@ -1,12 +1,8 @@
 """Script for creating embeddings from CSV and testing recommendations."""
 
-import os
 import sys
 import pandas as pd
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from core.config import CSV_FILE, IMAGES_DIR, EMBEDDINGS_FILE
 from core.clip import CLIPModel
 
@@ -4,7 +4,6 @@ import re
 import time
 import requests
 from bs4 import BeautifulSoup
-import mimetypes
 
 def save_image_safe(url, save_path):
     """
@@ -15,6 +15,11 @@ import { useToast } from "@/hooks/use-toast";
 
 const API_BASE_URL = "http://127.0.0.1:5000";
 
+// Results of recent searches, keyed by what was searched (image/crop + text),
+// so resubmitting an identical search skips both network round trips.
+const SEARCH_CACHE_SIZE = 20;
+const searchCache = new Map<string, { recommendations: any; externalLinks: any }>();
+
 // הרחבת הפרופס כדי לתמוך בהעברת הקונטקסט למסך הבא
 interface ExtendedModalProps extends Omit<DesignRequestModalProps, 'onResults'> {
     onResults: (data: RecommendationItem[], context: { 
@@ -70,8 +75,8 @@ const DesignRequestModal = ({ isOpen, onClose, onResults }: ExtendedModalProps)
             const items: DetectionItem[] = await res.json();
             setDetectedItems(items);
             
-            // נתיב לקובץ ששמור בצד השרת (appdata/uploads/filename.jpg)
-            const path = `appdata/uploads/${file.name}`;
+            // נתיב לקובץ ששמור בצד השרת (appdata/uploads/<content hash>.jpg)
+            const path = `appdata/uploads/${res.headers.get("X-Upload-Filename") ?? file.name}`;
             setOriginalImagePath(path); 
 
             if (items.length > 0) {
@@ -114,6 +119,10 @@ const DesignRequestModal = ({ isOpen, onClose, onResults }: ExtendedModalProps)
         
         setIsSearching(true);
         const selectedItem = selectedItemIndex !== null ? detectedItems[selectedItemIndex] : null;
+        const searchKey = JSON.stringify([
+            selectedItem?.crop_url ?? `${selectedFile.name}:${selectedFile.size}:${selectedFile.lastModified}`,
+            vision.trim(),
+        ]);
 
         try {
             // הכנת שאילתת גוגל מראש
@@ -122,44 +131,58 @@ const DesignRequestModal = ({ isOpen, onClose, onResults }: ExtendedModalProps)
                 googleQuery = selectedItem.class;
             }
 
-            // יצירת שני תהליכים במקביל
-            const recommendPromise = (async () => {
-                const formData = new FormData();
-                if (selectedItem) {
-                    formData.append("crop_url", selectedItem.crop_url);
-                } else {
-                    formData.append("image", selectedFile); 
-                }
-                formData.append("text", vision);
+            let cached = searchCache.get(searchKey);
+            if (!cached) {
+                // יצירת שני תהליכים במקביל
+                const recommendPromise = (async () => {
+                    const formData = new FormData();
+                    if (selectedItem) {
+                        formData.append("crop_url", selectedItem.crop_url);
+                    } else {
+                        formData.append("image", selectedFile); 
+                    }
+                    formData.append("text", vision);
                 
-                const res = await fetch(`${API_BASE_URL}/recommend`, { method: "POST", body: formData });
-                if (!res.ok) throw new Error("Search failed");
-                return res.json();
-            })();
+                    const res = await fetch(`${API_BASE_URL}/recommend`, { method: "POST", body: formData });
+                    if (!res.ok) throw new Error("Search failed");
+                    return res.json();
+                })();
 
-            const googleSearchPromise = (async () => {
-                if (!googleQuery) return [];
-                try {
-                    const googleRes = await fetch(`${API_BASE_URL}/google_search`, {
-                        method: "POST",
-                        headers: { "Content-Type": "application/json" },
-                        body: JSON.stringify({ query: googleQuery })
-                    });
-                    if (googleRes.ok) return await googleRes.json();
-                } catch (err) {
-                    console.error("Google search failed", err);
-                }
-                return [];
-            })();
+                const googleSearchPromise = (async () => {
+                    if (!googleQuery) return [];
+                    try {
+                        const googleRes = await fetch(`${API_BASE_URL}/google_search`, {
+                            method: "POST",
+                            headers: { "Content-Type": "application/json" },
+                            body: JSON.stringify({ query: googleQuery })
+                        });
+                        if (googleRes.ok) return await googleRes.json();
+                    } catch (err) {
+                        console.error("Google search failed", err);
+                    }
+                    return [];
+                })();
 
-            // המתנה לשניהם במקביל (זה חוסך המון זמן!)
-            const results = await Promise.allSettled([
-                recommendPromise,
-                googleSearchPromise
-            ]);
+                // המתנה לשניהם במקביל (זה חוסך המון זמן!)
+                const results = await Promise.allSettled([
+                    recommendPromise,
+                    googleSearchPromise
+                ]);
 
-            const recommendations = results[0].status === 'fulfilled' ? results[0].value : [];
-            const externalLinks = results[1].status === 'fulfilled' ? results[1].value : [];
+                cached = {
+                    recommendations: results[0].status === 'fulfilled' ? results[0].value : [],
+                    externalLinks: results[1].status === 'fulfilled' ? results[1].value : [],
+                };
+                // Only successful searches are worth replaying
+                if (results[0].status === 'fulfilled' && Array.isArray(cached.recommendations)) {
+                    searchCache.delete(searchKey);
+                    searchCache.set(searchKey, cached);
+                    if (searchCache.size > SEARCH_CACHE_SIZE) {
+                        searchCache.delete(searchCache.keys().next().value as string);
+                    }
+                }
+            }
+            const { recommendations, externalLinks } = cached;
 
             // מעבירים את התוצאות למסך הבא
             if (onResults && Array.isArray(recommendations)) {
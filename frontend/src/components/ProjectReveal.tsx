@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { motion } from "framer-motion";
 import { ArrowLeft, Download, ExternalLink, ShoppingBag, Heart, Bookmark, Check, Sparkles } from "lucide-react";
 import { Link } from "react-router-dom";
@@ -6,6 +6,19 @@ import heroImage from "@/assets/hero-interior.jpg";
 import { cn, formatPrice } from "@/lib/utils";
 // כתובת השרת
 const API_BASE_URL = "http://127.0.0.1:5000";
+// How often to ask the server whether a generation job has finished
+const GENERATION_POLL_MS = 1500;
+// Give up on a generation job after this many polls (10 minutes)
+const GENERATION_MAX_POLLS = 400;
+
+// Read a blob as base64 (without the data: URL prefix)
+const blobToBase64 = (blob: Blob): Promise<string> =>
+  new Promise((resolve, reject) => {
+    const reader = new FileReader();
+    reader.onload = () => resolve((reader.result as string).split(",")[1]);
+    reader.onerror = () => reject(reader.error);
+    reader.readAsDataURL(blob);
+  });
 
 export interface Product {
   id: string | number;
@@ -60,6 +73,10 @@ const ProjectReveal = ({
   const [savedItems, setSavedItems] = useState<Product[]>([]);
   const [isProjectSaved, setIsProjectSaved] = useState(false);
   const [generatingId, setGeneratingId] = useState<string | null>(null);
+  // Cancels the running generation poll when the component unmounts
+  const generationAbort = useRef<AbortController | null>(null);
+
+  useEffect(() => () => generationAbort.current?.abort(), []);
 
   // Wishlist persistence (localStorage)
   useEffect(() => {
@@ -132,6 +149,10 @@ const ProjectReveal = ({
     }
 
     setGeneratingId(id);
+    generationAbort.current?.abort();
+    const controller = new AbortController();
+    generationAbort.current = controller;
+    const { signal } = controller;
     try {
       const formData = new FormData();
       formData.append("original_image_path", generationContext.originalImagePath);
@@ -141,19 +162,36 @@ const ProjectReveal = ({
 
       const res = await fetch(`${API_BASE_URL}/generate_new_design`, {
         method: "POST",
-        body: formData
+        body: formData,
+        signal
       });
 
       if (!res.ok) throw new Error("Generation failed");
-      const data = await res.json();
-      
-      if (data.generated_image) {
-        onGeneratedImage(data.generated_image);
+      const { status_url } = await res.json();
+
+      // Generation runs as a background job on the server; poll until it ends
+      let data;
+      let polls = 0;
+      do {
+        if (++polls > GENERATION_MAX_POLLS) throw new Error("Generation timed out");
+        await new Promise((resolve) => setTimeout(resolve, GENERATION_POLL_MS));
+        const jobRes = await fetch(`${API_BASE_URL}${status_url}`, { signal });
+        if (!jobRes.ok) throw new Error("Generation failed");
+        data = await jobRes.json();
+      } while (data.status === "running");
+      if (data.status !== "finished") throw new Error(data.error || "Generation failed");
+
+      if (data.generated_image_url) {
+        // The server returns a URL; read the file back as base64 for saving/downloading
+        const imageRes = await fetch(`${API_BASE_URL}${data.generated_image_url}`, { signal });
+        if (!imageRes.ok) throw new Error("Failed to load generated image");
+        onGeneratedImage(await blobToBase64(await imageRes.blob()));
       }
     } catch (err) {
+      if (signal.aborted) return;
       console.error("Generation failed", err);
     } finally {
-      setGeneratingId(null);
+      if (!signal.aborted) setGeneratingId(null);
     }
   };
 
@@ -80,22 +80,46 @@ const StylingChat = ({ isOpen, onClose }: StylingChatProps) => {
         // מקרה קצה: אין תמונה בכלל (לא אמור לקרות אם חוסמים כפתור)
       }
 
+      // Ask for server-sent events: the reply text arrives as it is written,
+      // followed by one final event with the full reply and recommendations
       const res = await fetch(`${API_BASE_URL}/api/chat`, {
         method: "POST",
+        headers: { Accept: "text/event-stream" },
         body: formData
       });
 
-      if (!res.ok) throw new Error("Chat error");
-      const data = await res.json();
+      if (!res.ok || !res.body) throw new Error("Chat error");
 
-      const aiMsg: Message = {
-        id: Date.now() + 1,
-        role: "assistant",
-        content: data.response,
-        recommendations: data.recommendations
-      };
-      
-      setMessages(prev => [...prev, aiMsg]);
+      const aiMsgId = Date.now() + 1;
+      setMessages(prev => [...prev, { id: aiMsgId, role: "assistant", content: "" }]);
+      const updateAiMsg = (update: (msg: Message) => Message) =>
+        setMessages(prev => prev.map(m => (m.id === aiMsgId ? update(m) : m)));
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let data: { response?: string; recommendations?: Product[]; image_filename?: string } = {};
+      let finished = false;
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop() ?? "";
+        for (const event of events) {
+          if (!event.startsWith("data: ")) continue;
+          const payload = JSON.parse(event.slice(6));
+          if (payload.done) {
+            finished = true;
+            data = payload;
+            updateAiMsg(m => ({ ...m, content: payload.response, recommendations: payload.recommendations }));
+          } else {
+            updateAiMsg(m => ({ ...m, content: m.content + payload.delta }));
+          }
+        }
+      }
+      // A stream that closes before its final event was cut off server-side
+      if (!finished) throw new Error("Chat stream ended early");
       
       if (data.image_filename) {
         setServerImageFilename(data.image_filename);
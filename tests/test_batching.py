@@ -0,0 +1,72 @@
+"""Tests for the micro-batching scheduler behind YOLO predictions."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.batching import BatchScheduler
+
+
+def submit_concurrently(scheduler: BatchScheduler, items: list) -> list:
+    """Submit every item from its own thread and return the futures, in order."""
+    pool = ThreadPoolExecutor(max_workers=len(items))
+    futures = [pool.submit(scheduler.submit, item) for item in items]
+    pool.shutdown(wait=False)
+    return futures
+
+
+def test_results_match_items():
+    scheduler = BatchScheduler(lambda items: [item * 2 for item in items], max_batch=4, timeout=0.05)
+    futures = submit_concurrently(scheduler, list(range(10)))
+    assert [f.result(timeout=5) for f in futures] == [item * 2 for item in range(10)]
+
+
+def test_concurrent_submissions_are_batched():
+    batch_sizes = []
+    lock = threading.Lock()
+
+    def process_batch(items):
+        with lock:
+            batch_sizes.append(len(items))
+        return items
+
+    # A long fill window, so every submission lands in the first batches
+    scheduler = BatchScheduler(process_batch, max_batch=4, timeout=1.0)
+    futures = submit_concurrently(scheduler, list(range(8)))
+    assert sorted(f.result(timeout=5) for f in futures) == list(range(8))
+    assert sum(batch_sizes) == 8
+    assert max(batch_sizes) <= 4
+    assert len(batch_sizes) < 8
+
+
+def test_batch_error_reaches_every_caller():
+    def process_batch(items):
+        raise RuntimeError("model failed")
+
+    scheduler = BatchScheduler(process_batch, max_batch=4, timeout=0.05)
+    for future in submit_concurrently(scheduler, [1, 2, 3]):
+        with pytest.raises(RuntimeError, match="model failed"):
+            future.result(timeout=5)
+
+
+def test_missing_results_fail_instead_of_hanging():
+    scheduler = BatchScheduler(lambda items: items[:-1], max_batch=4, timeout=0.05)
+    for future in submit_concurrently(scheduler, [1, 2, 3]):
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+
+
+def test_worker_survives_a_failed_batch():
+    calls = []
+
+    def process_batch(items):
+        calls.append(items)
+        if len(calls) == 1:
+            raise RuntimeError("first batch fails")
+        return items
+
+    scheduler = BatchScheduler(process_batch, max_batch=1, timeout=0)
+    with pytest.raises(RuntimeError):
+        scheduler.submit("a")
+    assert scheduler.submit("b") == "b"
@@ -0,0 +1,74 @@
+"""Tests for extracting the streamed "response_text" value of a chat reply."""
+
+import json
+
+import pytest
+
+from core.recommender import ResponseTextReader
+
+
+TEXTS = [
+    "Plain reply",
+    'Quotes " and backslashes \\ and \\"both\\"',
+    "Line one\nLine two\ttabbed",
+    "ספה אפורה ליד החלון",
+    "Emoji 😀 and 🛋️ in a row",
+]
+
+
+def replies(text: str) -> list[str]:
+    """The reply as Gemini might write it, with escaped and raw non-ASCII text."""
+    return [
+        json.dumps({"response_text": text, "recommendations": []}, ensure_ascii=True),
+        json.dumps({"response_text": text, "recommendations": []}, ensure_ascii=False),
+        '```json\n{\n  "response_text" : ' + json.dumps(text) + ',\n  "recommendations": ["x"]\n}\n```',
+    ]
+
+
+def read(chunks: list[str]) -> list[str]:
+    """Feed the chunks in order and return the non-empty deltas."""
+    reader = ResponseTextReader()
+    return [delta for delta in map(reader.feed, chunks) if delta]
+
+
+def has_lone_surrogate(text: str) -> bool:
+    return any('\ud800' <= char <= '\udfff' for char in text)
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_every_two_way_split(text):
+    for reply in replies(text):
+        for split in range(len(reply) + 1):
+            deltas = read([reply[:split], reply[split:]])
+            assert "".join(deltas) == text, (reply, split)
+            assert not any(has_lone_surrogate(delta) for delta in deltas), (reply, split)
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_one_character_at_a_time(text):
+    for reply in replies(text):
+        deltas = read(list(reply))
+        assert "".join(deltas) == text
+        assert not any(has_lone_surrogate(delta) for delta in deltas)
+
+
+def test_split_surrogate_pair_is_held_back():
+    reader = ResponseTextReader()
+    assert reader.feed('{"response_text": "hi \\ud83d') == "hi "
+    assert reader.feed('\\ude00 end"}') == "😀 end"
+
+
+def test_text_is_streamed_before_the_reply_ends():
+    reader = ResponseTextReader()
+    assert reader.feed('{"response_text": "Hello') == "Hello"
+    assert reader.feed(' world') == " world"
+
+
+def test_nothing_after_the_closing_quote():
+    reader = ResponseTextReader()
+    assert reader.feed('{"response_text": "done", "other": "') == "done"
+    assert reader.feed('not part of the text"}') == ""
+
+
+def test_reply_without_response_text():
+    assert read(['{"recommendations": ', '[]}']) == []
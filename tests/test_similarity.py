@@ -0,0 +1,101 @@
+"""Tests comparing SimilarityIndex searches with a brute-force NumPy top-k."""
+
+import numpy as np
+import pytest
+
+from core.similarity import SimilarityIndex, faiss
+
+
+N, D, K = 2000, 128, 10
+
+
+@pytest.fixture(scope="module")
+def vectors() -> np.ndarray:
+    """Clustered unit vectors, so approximate indexes have real neighbourhoods."""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((50, D)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), N)] + 0.3 * rng.standard_normal((N, D)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture(scope="module")
+def queries(vectors) -> np.ndarray:
+    rng = np.random.default_rng(1)
+    picked = vectors[rng.integers(0, N, 20)]
+    # Not normalized: search() normalizes the query itself
+    return 3.0 * (picked + 0.1 * rng.standard_normal(picked.shape).astype(np.float32))
+
+
+def brute_force(vectors, query, k, positions=None):
+    """Exact top-k (positions, similarities) by a full matrix-vector product."""
+    query = query / np.linalg.norm(query)
+    rows = np.arange(len(vectors)) if positions is None else np.asarray(positions)
+    similarities = vectors[rows] @ query
+    order = np.argsort(-similarities)[:k]
+    return rows[order], similarities[order]
+
+
+def recall(found, expected) -> float:
+    return len(set(found.tolist()) & set(expected.tolist())) / len(expected)
+
+
+def test_flat_matches_brute_force(vectors, queries):
+    index = SimilarityIndex(vectors, precision='float32', index_type='flat')
+    for query in queries:
+        positions, similarities = index.search(query, K)
+        expected_positions, expected_similarities = brute_force(vectors, query, K)
+        np.testing.assert_array_equal(positions, expected_positions)
+        np.testing.assert_allclose(similarities, expected_similarities, atol=1e-5)
+
+
+@pytest.mark.parametrize("index_type", SimilarityIndex.INDEX_TYPES)
+def test_filtered_search_is_exact(vectors, queries, index_type):
+    if index_type != 'flat' and faiss is None:
+        pytest.skip("HNSW and IVF-PQ need faiss")
+    index = SimilarityIndex(vectors, precision='float32', index_type=index_type)
+    allowed = np.random.default_rng(2).choice(N, 300, replace=False)
+    for query in queries:
+        positions, similarities = index.search(query, K, allowed)
+        expected_positions, expected_similarities = brute_force(vectors, query, K, allowed)
+        np.testing.assert_array_equal(positions, expected_positions)
+        np.testing.assert_allclose(similarities, expected_similarities, atol=1e-5)
+
+
+def test_filtered_search_with_fewer_rows_than_k(vectors, queries):
+    index = SimilarityIndex(vectors, precision='float32', index_type='flat')
+    allowed = np.array([5, 17, 42])
+    positions, _ = index.search(queries[0], K, allowed)
+    assert sorted(positions.tolist()) == allowed.tolist()
+
+
+@pytest.mark.parametrize("index_type", ['hnsw', 'ivfpq'])
+def test_approximate_indexes_find_the_true_neighbours(vectors, queries, index_type):
+    pytest.importorskip("faiss")
+    index = SimilarityIndex(vectors, precision='float32', index_type=index_type)
+    recalls = []
+    for query in queries:
+        positions, similarities = index.search(query, K)
+        expected_positions, _ = brute_force(vectors, query, K)
+        recalls.append(recall(positions, expected_positions))
+        # Returned scores are exact similarities, best first
+        exact = vectors[positions] @ (query / np.linalg.norm(query))
+        np.testing.assert_allclose(similarities, exact, atol=1e-4)
+        assert np.all(np.diff(similarities) <= 1e-6)
+    assert np.mean(recalls) >= 0.9
+
+
+@pytest.mark.parametrize("precision", ['float16', 'int8'])
+def test_reduced_precision_keeps_the_ranking(vectors, queries, precision):
+    index = SimilarityIndex(vectors, precision=precision, index_type='flat')
+    for query in queries:
+        positions, similarities = index.search(query, K)
+        expected_positions, expected_similarities = brute_force(vectors, query, K)
+        assert recall(positions, expected_positions) >= 0.8
+        np.testing.assert_allclose(similarities, expected_similarities, atol=0.05)
+
+
+def test_large_k_returns_every_row(vectors, queries):
+    index = SimilarityIndex(vectors, precision='float32', index_type='flat')
+    positions, similarities = index.search(queries[0], 2 * N)
+    assert sorted(positions.tolist()) == list(range(N))
+    assert np.all(np.diff(similarities) <= 1e-6)
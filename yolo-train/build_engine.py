@@ -0,0 +1,45 @@
+"""Script for compiling the YOLO ONNX model into an FP16 TensorRT engine."""
+
+import sys
+from pathlib import Path
+
+import onnxruntime
+from ultralytics.utils.export.engine import onnx2engine
+
+from core.config import PROJECT_ROOT, YOLO_MODEL_NAME
+
+
+def build_engine(onnx_path: Path = PROJECT_ROOT / YOLO_MODEL_NAME) -> Path:
+    """
+    Build a TensorRT engine next to the ONNX model.
+
+    The detection service loads the .engine file instead of the ONNX model
+    when CUDA is available and the engine is newer than the model. Engines
+    are tied to the GPU and TensorRT version they were built with, so this
+    has to run on the deployment machine (building takes a few minutes).
+
+    Args:
+        onnx_path: Path to the ONNX model. Defaults to config YOLO_MODEL_NAME.
+
+    Returns:
+        Path of the written engine
+    """
+    engine_path = onnx_path.with_suffix('.engine')
+    # Carry over the class names, stride and image size Ultralytics reads
+    # from the ONNX metadata; the engine would otherwise load without them
+    session = onnxruntime.InferenceSession(str(onnx_path), providers=['CPUExecutionProvider'])
+    metadata = dict(session.get_modelmeta().custom_metadata_map)
+    shape = tuple(session.get_inputs()[0].shape)
+
+    print(f"🔄 Building FP16 TensorRT engine from {onnx_path.name} (input {shape})...")
+    onnx2engine(str(onnx_path), str(engine_path), half=True, shape=shape, metadata=metadata)
+    print(f"✅ Saved engine to {engine_path}")
+    return engine_path
+
+
+if __name__ == "__main__":
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else PROJECT_ROOT / YOLO_MODEL_NAME
+    if not path.exists():
+        print(f"❌ ONNX model not found: {path}")
+        sys.exit(1)
+    build_engine(path)